@@ -9,50 +9,294 @@ https://sicherheitskritisch.de/
 """
 
 import asyncio
+import cProfile
+import collections
+import heapq
 import homeassistant.helpers.config_validation as cv
 import logging
 import os.path
 import re
+import stat
+import time
 import voluptuous as vol
 
+from datetime import timedelta
+
 from serial_asyncio import open_serial_connection
 
 from homeassistant.const import (
-    EVENT_HOMEASSISTANT_START, EVENT_HOMEASSISTANT_STOP
+    ATTR_FRIENDLY_NAME,
+    ATTR_UNIT_OF_MEASUREMENT,
+    CONF_ID,
+    EVENT_HOMEASSISTANT_START,
+    EVENT_HOMEASSISTANT_STOP
 )
 
+from homeassistant.helpers.event import async_track_time_interval
+
 REQUIREMENTS = ['pyserial-asyncio==0.4']
 
 _LOGGER = logging.getLogger(__name__)
 DOMAIN = 'asysbus'
 
+## TODO: Extract to configuration
+ASB_BRIDGE_NODE_ID = 0x0001
+
+ASB_PKGTYPE_BROADCAST = 0x00
+ASB_PKGTYPE_MULTICAST = 0x01
+ASB_PKGTYPE_UNICAST = 0x02
+
+## Packets to or from this port address all ports of a node
+ASB_PORT_ALL = 0xFF
+
+ASB_CMD_REQ = 0x40
+ASB_CMD_1B = 0x51
+ASB_CMD_S_TEMP = 0xA0
+ASB_CMD_S_HUM = 0xA1
+ASB_CMD_S_LIGHT = 0xDB
+
 CONF_SERIAL_PORT = 'serial_port'
 CONF_BAUDRATE = 'baudrate'
+CONF_FRAMING = 'framing'
+CONF_BUS_BITRATE = 'bus_bitrate'
+CONF_BUTTONS = 'buttons'
+CONF_COMMAND = 'command'
+CONF_LONG_PRESS = 'long_press'
+CONF_DUPLICATE_WINDOW = 'duplicate_window'
+CONF_STALE_TIMEOUT = 'stale_timeout'
+CONF_UNAVAILABLE_TIMEOUT = 'unavailable_timeout'
+CONF_MULTIPLEXER_HOST = 'multiplexer_host'
+CONF_MULTIPLEXER_PORT = 'multiplexer_port'
+CONF_MULTIPLEXER_SOCKET = 'multiplexer_socket'
+CONF_FLOOD_RATE = 'flood_rate'
+CONF_FLOOD_QUARANTINE = 'flood_quarantine'
+CONF_FLOOD_SAMPLE = 'flood_sample'
+
+ASB_FRAMING_TEXT = 'text'
+ASB_FRAMING_BINARY = 'binary'
+
+ASB_FRAMINGS = [ASB_FRAMING_TEXT, ASB_FRAMING_BINARY]
 
 DEFAULT_BAUDRATE = 115200
+DEFAULT_FRAMING = ASB_FRAMING_TEXT
+DEFAULT_BUS_BITRATE = 125000
+DEFAULT_LONG_PRESS = 0.5
+DEFAULT_DUPLICATE_WINDOW = 0.1
+DEFAULT_STALE_TIMEOUT = 300
+DEFAULT_UNAVAILABLE_TIMEOUT = 900
+DEFAULT_MULTIPLEXER_HOST = '127.0.0.1'
+DEFAULT_FLOOD_RATE = 50
+DEFAULT_FLOOD_QUARANTINE = 10.0
+DEFAULT_FLOOD_SAMPLE = 10
+
+BUTTON_SCHEMA = vol.Schema({
+    vol.Required(CONF_ID): vol.All(vol.Coerce(int), vol.Range(
+        min=0x0000,
+        max=0xFFFF
+    )),
+    vol.Optional(CONF_COMMAND, default=ASB_CMD_1B): vol.All(vol.Coerce(int),
+        vol.Range(min=0x00, max=0xFF)
+    ),
+    vol.Optional(CONF_LONG_PRESS, default=DEFAULT_LONG_PRESS): vol.All(
+        vol.Coerce(float),
+        vol.Range(min=0)
+    ),
+})
 
 CONFIG_SCHEMA = vol.Schema({
     DOMAIN: vol.Schema({
         vol.Required(CONF_SERIAL_PORT): cv.string,
         vol.Optional(CONF_BAUDRATE, default=DEFAULT_BAUDRATE): cv.positive_int,
+        vol.Optional(CONF_FRAMING, default=DEFAULT_FRAMING):
+            vol.In(ASB_FRAMINGS),
+        vol.Optional(CONF_BUS_BITRATE, default=DEFAULT_BUS_BITRATE):
+            cv.positive_int,
+        vol.Optional(CONF_BUTTONS, default=[]): vol.All(
+            cv.ensure_list,
+            [BUTTON_SCHEMA]
+        ),
+        vol.Optional(CONF_DUPLICATE_WINDOW, default=DEFAULT_DUPLICATE_WINDOW):
+            vol.All(vol.Coerce(float), vol.Range(min=0)),
+        vol.Optional(CONF_STALE_TIMEOUT, default=DEFAULT_STALE_TIMEOUT):
+            vol.All(vol.Coerce(float), vol.Range(min=0)),
+        vol.Optional(CONF_UNAVAILABLE_TIMEOUT,
+            default=DEFAULT_UNAVAILABLE_TIMEOUT):
+            vol.All(vol.Coerce(float), vol.Range(min=0)),
+        vol.Optional(CONF_MULTIPLEXER_HOST, default=DEFAULT_MULTIPLEXER_HOST):
+            cv.string,
+        vol.Optional(CONF_MULTIPLEXER_PORT): cv.port,
+        vol.Optional(CONF_MULTIPLEXER_SOCKET): cv.string,
+        vol.Optional(CONF_FLOOD_RATE, default=DEFAULT_FLOOD_RATE):
+            vol.All(vol.Coerce(int), vol.Range(min=0)),
+        vol.Optional(CONF_FLOOD_QUARANTINE, default=DEFAULT_FLOOD_QUARANTINE):
+            vol.All(vol.Coerce(float), vol.Range(min=0)),
+        vol.Optional(CONF_FLOOD_SAMPLE, default=DEFAULT_FLOOD_SAMPLE):
+            vol.All(vol.Coerce(int), vol.Range(min=0)),
     }),
 }, extra=vol.ALLOW_EXTRA)
 
 EVENT_HOMEASSISTANT_ASYSBUS_SERIAL_READY = \
     "event_homeassistant_asysbus_serial_ready"
 
+EVENT_ASYSBUS_BUTTON = "asysbus_button"
+EVENT_ASYSBUS_STATES = "asysbus_states"
+
+SERVICE_SET_STATES = 'set_states'
+SERVICE_GET_STATES = 'get_states'
+SERVICE_PROFILE = 'profile'
+
+EVENT_ASYSBUS_PROFILE = "asysbus_profile"
+
+ATTR_NODE_ID = 'node_id'
+ATTR_COMMAND = 'command'
+ATTR_CLICK_TYPE = 'click_type'
+ATTR_NODE_IDS = 'node_ids'
+ATTR_PORT = 'port'
+ATTR_DATA = 'data'
+ATTR_STATES = 'states'
+ATTR_DURATION = 'duration'
+ATTR_CPROFILE = 'cprofile'
+ATTR_FILENAME = 'filename'
+ATTR_STAGES = 'stages'
+
+DEFAULT_PROFILE_DURATION = 10
+DEFAULT_PROFILE_FILENAME = 'asysbus_profile.prof'
+
+CLICK_TYPE_PRESS = 'press'
+CLICK_TYPE_RELEASE = 'release'
+CLICK_TYPE_SHORT_PRESS = 'short_press'
+CLICK_TYPE_LONG_PRESS = 'long_press'
+
+NODE_ID_SCHEMA = vol.All(vol.Coerce(int), vol.Range(min=0x0000, max=0xFFFF))
+
+NODE_STATE_SCHEMA = vol.Schema({
+    vol.Required(ATTR_NODE_ID): NODE_ID_SCHEMA,
+    vol.Optional(ATTR_PORT, default=ASB_PORT_ALL): vol.All(vol.Coerce(int),
+        vol.Range(min=0x01, max=0xFF)
+    ),
+    vol.Required(ATTR_DATA): vol.All(
+        cv.ensure_list,
+        [vol.All(vol.Coerce(int), vol.Range(min=0x00, max=0xFF))],
+        vol.Length(min=1, max=8)
+    ),
+})
+
+SERVICE_SET_STATES_SCHEMA = vol.Schema({
+    vol.Required(ATTR_STATES): vol.All(cv.ensure_list, [NODE_STATE_SCHEMA]),
+})
+
+SERVICE_GET_STATES_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_NODE_IDS): vol.All(cv.ensure_list, [NODE_ID_SCHEMA]),
+})
+
+def validateProfileFilename(value):
+    """Validate that the profile is written into the configuration directory."""
+
+    value = cv.string(value)
+
+    if (os.path.basename(value) != value or value in ['', '.', '..']):
+        raise vol.Invalid("The filename '{}' must not contain a " \
+            "directory".format(value)
+        )
+
+    return value
+
+SERVICE_PROFILE_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_DURATION, default=DEFAULT_PROFILE_DURATION): vol.All(
+        vol.Coerce(int),
+        vol.Range(min=1, max=3600)
+    ),
+    vol.Optional(ATTR_CPROFILE, default=True): cv.boolean,
+    vol.Optional(ATTR_FILENAME, default=DEFAULT_PROFILE_FILENAME):
+        validateProfileFilename,
+})
+
+ENTITY_ID_SERIAL_BRIDGE = DOMAIN + ".serial_bridge"
+
+METRICS_INTERVAL = timedelta(seconds=10)
+
 ASBSERIALBRIDGE = None
 
-## TODO: Extract to configuration
-ASB_BRIDGE_NODE_ID = 0x0001
+ASB_AGGREGATION_MIN = 'min'
+ASB_AGGREGATION_MAX = 'max'
+ASB_AGGREGATION_MEAN = 'mean'
+ASB_AGGREGATION_LAST = 'last'
 
-ASB_PKGTYPE_BROADCAST = 0x00
-ASB_PKGTYPE_MULTICAST = 0x01
-ASB_PKGTYPE_UNICAST = 0x02
+ASB_AGGREGATIONS = {
+    ASB_AGGREGATION_MIN: min,
+    ASB_AGGREGATION_MAX: max,
+    ASB_AGGREGATION_MEAN: lambda values: sum(values) / len(values),
+    ASB_AGGREGATION_LAST: lambda values: values[-1],
+}
 
-ASB_CMD_REQ = 0x40
-ASB_CMD_1B = 0x51
-ASB_CMD_S_LIGHT = 0xDB
+## Binary framing: start byte, body length, body, CRC-8 checksum of the body
+## The body is type (1), target (2), source (2), port (1), length (1), data (n)
+ASB_BINARY_FRAME_START = 0x7E
+ASB_BINARY_FRAME_HEADER_LENGTH = 2
+ASB_BINARY_FRAME_BODY_META_LENGTH = 7
+ASB_BINARY_FRAME_CHECKSUM_LENGTH = 1
+
+## A packet carries at most eight data bytes like a CAN frame
+ASB_BINARY_FRAME_BODY_MAX_LENGTH = ASB_BINARY_FRAME_BODY_META_LENGTH + 8
+
+ASB_CRC8_POLYNOMIAL = 0x07
+
+## One start bit, eight data bits and one stop bit per byte (8N1)
+UART_BITS_PER_BYTE = 10
+
+## Extended CAN frame including the interframe space, see
+## "Controller Area Network (CAN) schedulability analysis" (Davis et al.)
+CAN_FRAME_OVERHEAD_BITS = 67
+CAN_FRAME_STUFFABLE_BITS = 54
+
+## Airtime which may be written in a burst before the pacing starts
+ASB_WRITE_BURST_AIRTIME = 0.01
+
+## Number of packet batches queued for writing before new ones are dropped
+ASB_WRITE_QUEUE_SIZE = 256
+
+## Window over which the link utilization is measured
+ASB_LINK_UTILIZATION_WINDOW = 10.0
+
+## A press packet of a long pressed button later than this is a new press,
+## because the release packet of the previous press was lost
+ASB_BUTTON_REPEAT_TIMEOUT = 1.0
+
+## Number of source nodes whose last frame is checked for duplicates
+ASB_DUPLICATE_FILTER_SIZE = 64
+
+## Interval of the staleness check, at most one node is requested per check
+ASB_STALE_CHECK_INTERVAL = 1.0
+
+## First delay before a silent node is requested again, doubled every time
+ASB_STALE_RETRY_DELAY = 10.0
+
+## Number of frames buffered for each client of the multiplexer server
+ASB_MULTIPLEXER_CLIENT_BUFFER_SIZE = 256
+
+ASB_MULTIPLEXER_COMMAND_SUBSCRIBE = b"subscribe"
+
+## Window in which the packets of each node are counted for flood protection
+ASB_FLOOD_WINDOW = 1.0
+
+## The time waiting for the gateway, which includes reading the frame
+ASB_PROFILE_STAGE_IDLE = 'idle'
+ASB_PROFILE_STAGE_DECODE = 'decode'
+ASB_PROFILE_STAGE_DISPATCH = 'dispatch'
+ASB_PROFILE_STAGE_ENTITY_CALLBACK = 'entity_callback'
+ASB_PROFILE_STAGE_PUBLISH = 'publish'
+ASB_PROFILE_STAGE_ENCODE = 'encode'
+ASB_PROFILE_STAGE_WRITE = 'write'
+
+ASB_PROFILE_STAGES = [
+    ASB_PROFILE_STAGE_IDLE,
+    ASB_PROFILE_STAGE_DECODE,
+    ASB_PROFILE_STAGE_DISPATCH,
+    ASB_PROFILE_STAGE_ENTITY_CALLBACK,
+    ASB_PROFILE_STAGE_PUBLISH,
+    ASB_PROFILE_STAGE_ENCODE,
+    ASB_PROFILE_STAGE_WRITE,
+]
 
 @asyncio.coroutine
 def async_setup(hass, config):
@@ -62,11 +306,44 @@ def async_setup(hass, config):
 
     serialPort = config[DOMAIN][CONF_SERIAL_PORT]
     baudrate = config[DOMAIN][CONF_BAUDRATE]
+    framing = config[DOMAIN][CONF_FRAMING]
+    busBitrate = config[DOMAIN][CONF_BUS_BITRATE]
+    duplicateWindow = config[DOMAIN][CONF_DUPLICATE_WINDOW]
+    staleTimeout = config[DOMAIN][CONF_STALE_TIMEOUT]
+    unavailableTimeout = config[DOMAIN][CONF_UNAVAILABLE_TIMEOUT]
+
+    floodProtection = None
+
+    if (config[DOMAIN][CONF_FLOOD_RATE] > 0):
+        floodProtection = AsbFloodProtection(
+            config[DOMAIN][CONF_FLOOD_RATE],
+            config[DOMAIN][CONF_FLOOD_QUARANTINE],
+            config[DOMAIN][CONF_FLOOD_SAMPLE]
+        )
+
+    multiplexerServer = None
+
+    if (CONF_MULTIPLEXER_PORT in config[DOMAIN] or
+        CONF_MULTIPLEXER_SOCKET in config[DOMAIN]):
+        multiplexerServer = AsbMultiplexerServer(
+            config[DOMAIN][CONF_MULTIPLEXER_HOST],
+            config[DOMAIN].get(CONF_MULTIPLEXER_PORT),
+            config[DOMAIN].get(CONF_MULTIPLEXER_SOCKET)
+        )
+
+    buttons = {}
+
+    for button in config[DOMAIN][CONF_BUTTONS]:
+        buttons[(button[CONF_ID], button[CONF_COMMAND])] = \
+            button[CONF_LONG_PRESS]
 
     global ASBSERIALBRIDGE
 
     if (os.path.exists(serialPort)):
-        ASBSERIALBRIDGE = AsysbusSerialBridge(hass, serialPort, baudrate)
+        ASBSERIALBRIDGE = AsysbusSerialBridge(hass, serialPort, baudrate,
+            framing, busBitrate, buttons, duplicateWindow, staleTimeout,
+            unavailableTimeout, multiplexerServer, floodProtection
+        )
     else:
         _LOGGER.error("async_setup(): The serial port '%s' for " + \
             "the Asysbus serial bridge is not accessible!",
@@ -77,6 +354,94 @@ def async_setup(hass, config):
     hass.bus.async_listen_once(EVENT_HOMEASSISTANT_START, startAsysbusService)
     hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, stopAsysbusService)
 
+    @asyncio.coroutine
+    def publishAsysbusMetricsInterval(now):
+        """Publish the metrics of the Asysbus serial bridge periodically."""
+        publishAsysbusMetrics(hass)
+
+    async_track_time_interval(hass, publishAsysbusMetricsInterval,
+        METRICS_INTERVAL
+    )
+
+    @asyncio.coroutine
+    def setAsysbusStates(call):
+        """Send the states to many nodes at once."""
+
+        if (ASBSERIALBRIDGE is not None):
+            yield from ASBSERIALBRIDGE.setNodeStates([
+                (state[ATTR_NODE_ID], state[ATTR_PORT], state[ATTR_DATA])
+                for state in call.data[ATTR_STATES]
+            ])
+
+    @asyncio.coroutine
+    def getAsysbusStates(call):
+        """Fire the cached states of many nodes at once as event."""
+
+        if (ASBSERIALBRIDGE is not None):
+            nodeStates = ASBSERIALBRIDGE.getNodeStates(
+                call.data.get(ATTR_NODE_IDS)
+            )
+
+            hass.bus.async_fire(EVENT_ASYSBUS_STATES, {
+                ATTR_STATES: [{
+                    ATTR_NODE_ID: nodeId,
+                    ATTR_PORT: port,
+                    ATTR_DATA: data,
+                } for nodeId, port, data in nodeStates]
+            })
+
+    @asyncio.coroutine
+    def profileAsysbus(call):
+        """Profile the read and write loop of the bridge for a while."""
+
+        if (ASBSERIALBRIDGE is None):
+            return
+
+        profiler = AsbProfiler(call.data[ATTR_CPROFILE])
+
+        if (not ASBSERIALBRIDGE.startProfiling(profiler)):
+            _LOGGER.warning("profileAsysbus(): The Asysbus serial bridge " + \
+                "is already profiled!"
+            )
+            return
+
+        yield from asyncio.sleep(call.data[ATTR_DURATION])
+        ASBSERIALBRIDGE.stopProfiling()
+
+        profileFilename = None
+
+        if (call.data[ATTR_CPROFILE]):
+            profileFilename = hass.config.path(call.data[ATTR_FILENAME])
+            yield from hass.async_add_job(profiler.writeStats, profileFilename)
+
+        profileSummary = profiler.getSummary()
+
+        for stage, stageSummary in profileSummary.items():
+            _LOGGER.info("profileAsysbus(): %s: %s calls, %.3f ms total, " + \
+                "%.1f us mean",
+                stage,
+                stageSummary['count'],
+                stageSummary['total_ms'],
+                stageSummary['mean_us']
+            )
+
+        hass.bus.async_fire(EVENT_ASYSBUS_PROFILE, {
+            ATTR_STAGES: profileSummary,
+            ATTR_FILENAME: profileFilename,
+        })
+
+    hass.services.async_register(DOMAIN, SERVICE_PROFILE,
+        profileAsysbus, schema=SERVICE_PROFILE_SCHEMA
+    )
+
+    hass.services.async_register(DOMAIN, SERVICE_SET_STATES,
+        setAsysbusStates, schema=SERVICE_SET_STATES_SCHEMA
+    )
+
+    hass.services.async_register(DOMAIN, SERVICE_GET_STATES,
+        getAsysbusStates, schema=SERVICE_GET_STATES_SCHEMA
+    )
+
     return wasSuccessful
 
 @asyncio.coroutine
@@ -93,6 +458,19 @@ def stopAsysbusService(event):
     if (ASBSERIALBRIDGE is not None):
         ASBSERIALBRIDGE.closeConnection()
 
+def publishAsysbusMetrics(hass):
+    """Publish the metrics of the Asysbus serial bridge as state."""
+
+    if (ASBSERIALBRIDGE is not None):
+        metrics = ASBSERIALBRIDGE.getMetrics()
+        metrics[ATTR_FRIENDLY_NAME] = "Asysbus serial bridge"
+        metrics[ATTR_UNIT_OF_MEASUREMENT] = "%"
+
+        hass.states.async_set(ENTITY_ID_SERIAL_BRIDGE,
+            round(metrics['link_utilization'] * 100, 1),
+            metrics
+        )
+
 class AsbMeta(object):
     def __init__(self, type, port, source, target):
         self.type = type
@@ -223,19 +601,837 @@ def encodeAsbPacket(asbPacket):
     asbPacketEncoded = asbPacketString.encode('UTF-8')
     return asbPacketEncoded
 
+def createCrc8Table(polynomial):
+    crc8Table = []
+
+    for byte in range(256):
+        crc = byte
+
+        for bit in range(8):
+            if (crc & 0x80):
+                crc = ((crc << 1) ^ polynomial) & 0xFF
+            else:
+                crc = (crc << 1) & 0xFF
+
+        crc8Table.append(crc)
+
+    return crc8Table
+
+ASB_CRC8_TABLE = createCrc8Table(ASB_CRC8_POLYNOMIAL)
+
+def calculateAsbChecksum(data):
+    crc = 0x00
+
+    for byte in data:
+        crc = ASB_CRC8_TABLE[crc ^ byte]
+
+    return crc
+
+def decodeAsbPacketBinary(packetBytes):
+    asbPacket = None
+
+    packetMinimumLength = (
+        ASB_BINARY_FRAME_HEADER_LENGTH +
+        ASB_BINARY_FRAME_BODY_META_LENGTH +
+        ASB_BINARY_FRAME_CHECKSUM_LENGTH
+    )
+
+    if (len(packetBytes) < packetMinimumLength or
+        packetBytes[0] != ASB_BINARY_FRAME_START):
+        return asbPacket
+
+    packetBodyLength = packetBytes[1]
+    packetBody = packetBytes[
+        ASB_BINARY_FRAME_HEADER_LENGTH:-ASB_BINARY_FRAME_CHECKSUM_LENGTH
+    ]
+    packetChecksum = packetBytes[-1]
+
+    if (packetBodyLength != len(packetBody)):
+        _LOGGER.warning("decodeAsbPacketBinary(): The frame length (%s) " + \
+            "is not equal to the received frame body length (%s)!",
+            packetBodyLength,
+            len(packetBody)
+        )
+    elif (packetChecksum != calculateAsbChecksum(packetBody)):
+        _LOGGER.warning("decodeAsbPacketBinary(): The frame checksum " + \
+            "0x%02X is invalid!",
+            packetChecksum
+        )
+    else:
+        packetType = packetBody[0]
+        packetTarget = (packetBody[1] << 8) | packetBody[2]
+        packetSource = (packetBody[3] << 8) | packetBody[4]
+        packetPort = packetBody[5]
+        packetLength = packetBody[6]
+        packetData = list(packetBody[ASB_BINARY_FRAME_BODY_META_LENGTH:])
+
+        if (packetLength == len(packetData)):
+            asbPacket = AsbPacket(
+                AsbMeta(
+                    packetType,
+                    packetPort,
+                    packetSource,
+                    packetTarget,
+                ),
+                packetLength,
+                packetData
+            )
+
+        else:
+            _LOGGER.warning("decodeAsbPacketBinary(): The packet length " + \
+                "(%s) is not equal to the received packet data length (%s)!",
+                packetLength,
+                len(packetData)
+            )
+
+    return asbPacket
+
+def encodeAsbPacketBinary(asbPacket):
+    asbPacketPort = asbPacket.meta.port if asbPacket.meta.port > 0 else 0xFF
+
+    ## The iterator element must be cast to integer to be sure it can packed
+    asbPacketBody = bytes([
+        asbPacket.meta.type,
+        (asbPacket.meta.target >> 8) & 0xFF,
+        asbPacket.meta.target & 0xFF,
+        (asbPacket.meta.source >> 8) & 0xFF,
+        asbPacket.meta.source & 0xFF,
+        asbPacketPort,
+        asbPacket.length,
+    ] + [int(e) for e in asbPacket.data])
+
+    asbPacketEncoded = (
+        bytes([ASB_BINARY_FRAME_START, len(asbPacketBody)]) +
+        asbPacketBody +
+        bytes([calculateAsbChecksum(asbPacketBody)])
+    )
+
+    return asbPacketEncoded
+
+@asyncio.coroutine
+def readAsbFrame(streamReader, framing):
+    """Read the next raw frame of the given framing from the stream."""
+
+    if (framing != ASB_FRAMING_BINARY):
+        frame = yield from streamReader.readline()
+        return frame
+
+    frameStart = yield from streamReader.readexactly(1)
+
+    ## Skip all bytes until the start of the next frame to resynchronize
+    while True:
+        if (frameStart[0] != ASB_BINARY_FRAME_START):
+            frameStart = yield from streamReader.readexactly(1)
+            continue
+
+        frameBodyLength = yield from streamReader.readexactly(1)
+
+        if (ASB_BINARY_FRAME_BODY_META_LENGTH <= frameBodyLength[0] <=
+            ASB_BINARY_FRAME_BODY_MAX_LENGTH):
+            break
+
+        ## A start byte within garbage must not swallow the following frames
+        frameStart = frameBodyLength
+    frameBody = yield from streamReader.readexactly(
+        frameBodyLength[0] + ASB_BINARY_FRAME_CHECKSUM_LENGTH
+    )
+
+    return frameStart + frameBodyLength + frameBody
+
+def decodeAsbFrame(frame, framing):
+    if (framing == ASB_FRAMING_BINARY):
+        return decodeAsbPacketBinary(frame)
+
+    return decodeAsbPacket(frame.decode('UTF-8').strip())
+
+def encodeAsbFrame(asbPacket, framing):
+    if (framing == ASB_FRAMING_BINARY):
+        return encodeAsbPacketBinary(asbPacket)
+
+    return encodeAsbPacket(asbPacket)
+
+def calculateAsbAirtime(encodedLength, dataLength, baudrate, busBitrate):
+    """Return the time in seconds a packet occupies the slowest link."""
+
+    serialAirtime = (encodedLength * UART_BITS_PER_BYTE) / baudrate
+
+    ## Worst case bit stuffing of the CAN frame on the downstream bus
+    busFrameBits = CAN_FRAME_OVERHEAD_BITS + 8 * dataLength + \
+        (CAN_FRAME_STUFFABLE_BITS + 8 * dataLength - 1) // 4
+    busAirtime = busFrameBits / busBitrate
+
+    return max(serialAirtime, busAirtime)
+
+class AsbTokenBucket(object):
+    """Token bucket which limits the offered load to the given rate."""
+
+    def __init__(self, rate, capacity, now):
+        self.__rate = rate
+        self.__capacity = capacity
+        self.__tokens = capacity
+        self.__lastUpdate = now
+
+    def consume(self, tokens, now):
+        """Take the tokens and return the seconds to wait before sending."""
+
+        self.__tokens = min(self.__capacity,
+            self.__tokens + (now - self.__lastUpdate) * self.__rate
+        )
+        self.__lastUpdate = now
+
+        ## The tokens are taken in advance, thus the deficit is the delay
+        self.__tokens -= tokens
+
+        return max(0.0, -self.__tokens / self.__rate)
+
+class AsbAirtimeMeter(object):
+    """Sliding window measurement of the link utilization."""
+
+    def __init__(self, window):
+        self.__window = window
+        self.__airtimes = collections.deque()
+        self.__airtimeSum = 0.0
+
+    def add(self, airtime, now):
+        self.__airtimes.append((now, airtime))
+        self.__airtimeSum += airtime
+        self.__expire(now)
+
+    def getUtilization(self, now):
+        self.__expire(now)
+        return min(1.0, self.__airtimeSum / self.__window)
+
+    def __expire(self, now):
+        while (self.__airtimes and
+            self.__airtimes[0][0] <= now - self.__window):
+            self.__airtimeSum -= self.__airtimes.popleft()[1]
+
+        if (not self.__airtimes):
+            self.__airtimeSum = 0.0
+
+class AsbValueAggregator(object):
+    """Downsampling of the values frequently reported by a node."""
+
+    def __init__(self, aggregation, window, deadband=0.0, maxUpdateRate=None):
+        self.__aggregate = ASB_AGGREGATIONS[aggregation]
+        self.__window = window
+        self.__deadband = deadband
+        self.__minUpdateInterval = \
+            (1.0 / maxUpdateRate) if maxUpdateRate else 0.0
+        self.__values = []
+        self.__windowStart = None
+        self.__lastValue = None
+        self.__lastUpdate = None
+
+    def add(self, value, now):
+        """Add a value and return the aggregated value if it is due."""
+
+        aggregatedValue = self.flush(now)
+
+        ## The first value after a quiet window is written immediately
+        if (self.__windowStart is None):
+            self.__windowStart = now
+            return self.__update(value, now)
+
+        self.__values.append(value)
+        return aggregatedValue
+
+    def getFlushTime(self):
+        """Return when the values of the current window must be flushed."""
+
+        if (not self.__values):
+            return None
+
+        return self.__windowStart + self.__window
+
+    def flush(self, now):
+        """Close the window if it is over and return its aggregated value."""
+
+        if (self.__windowStart is None or
+            now - self.__windowStart < self.__window):
+            return None
+
+        values = self.__values
+        self.__values = []
+
+        ## The window without values ends the activity of the node
+        if (not values):
+            self.__windowStart = None
+            return None
+
+        self.__windowStart = now
+        return self.__update(self.__aggregate(values), now)
+
+    def __update(self, aggregatedValue, now):
+        if (self.__lastValue is not None):
+            if (abs(aggregatedValue - self.__lastValue) <= self.__deadband):
+                return None
+
+            if (now - self.__lastUpdate < self.__minUpdateInterval):
+                return None
+
+        self.__lastValue = aggregatedValue
+        self.__lastUpdate = now
+
+        return aggregatedValue
+
+class AsbButtonPress(object):
+    """Current press of a button."""
+
+    def __init__(self, longPressTimer, now):
+        self.longPressTimer = longPressTimer
+        self.lastPacketTime = now
+
+class AsbButtonHandler(object):
+    """Detection of press, short press, long press and release of buttons."""
+
+    def __init__(self, buttons, fireEvent, callLater):
+        self.__buttons = buttons
+        self.__fireEvent = fireEvent
+        self.__callLater = callLater
+        self.__buttonPresses = {}
+
+    def handlePacket(self, asbPacket, now):
+        if (asbPacket.length < 1):
+            return
+
+        buttonKey = (asbPacket.meta.source, asbPacket.data[0])
+        longPressTime = self.__buttons.get(buttonKey)
+
+        if (longPressTime is None):
+            return
+
+        ## Packets without state are momentary presses without release
+        if (asbPacket.length < 2):
+            self.__fireEvent(buttonKey, CLICK_TYPE_PRESS)
+            self.__fireEvent(buttonKey, CLICK_TYPE_SHORT_PRESS)
+
+        elif (asbPacket.data[1] != 0x0):
+            buttonPress = self.__buttonPresses.get(buttonKey)
+
+            ## The press of a lost release packet is released first
+            if (buttonPress is not None and
+                buttonPress.longPressTimer is None and
+                now - buttonPress.lastPacketTime > ASB_BUTTON_REPEAT_TIMEOUT):
+                self.__release(buttonKey)
+                buttonPress = None
+
+            ## Repeated press packets of a held button are ignored
+            if (buttonPress is not None):
+                buttonPress.lastPacketTime = now
+                return
+
+            self.__fireEvent(buttonKey, CLICK_TYPE_PRESS)
+
+            self.__buttonPresses[buttonKey] = AsbButtonPress(
+                self.__callLater(longPressTime, self.__fireLongPress,
+                    buttonKey
+                ),
+                now
+            )
+
+        elif (buttonKey in self.__buttonPresses):
+            self.__release(buttonKey)
+
+    def __fireLongPress(self, buttonKey):
+        ## The press is kept to know that the long press was already fired
+        self.__buttonPresses[buttonKey].longPressTimer = None
+        self.__fireEvent(buttonKey, CLICK_TYPE_LONG_PRESS)
+
+    def __release(self, buttonKey):
+        buttonPress = self.__buttonPresses.pop(buttonKey)
+
+        if (buttonPress.longPressTimer is not None):
+            buttonPress.longPressTimer.cancel()
+            self.__fireEvent(buttonKey, CLICK_TYPE_SHORT_PRESS)
+
+        self.__fireEvent(buttonKey, CLICK_TYPE_RELEASE)
+
+class AsbDuplicateFilter(object):
+    """Detection of frames repeating the last frame of their source node."""
+
+    def __init__(self, window, size=ASB_DUPLICATE_FILTER_SIZE):
+        self.__window = window
+        self.__size = size
+
+        ## The last frame and its first receive time by source node id
+        self.__lastFrames = collections.OrderedDict()
+
+    def isDuplicate(self, source, frame, now):
+        lastFrame = self.__lastFrames.get(source)
+
+        ## The window starts with the first frame, so it is not extended
+        if (lastFrame is not None and lastFrame[0] == frame and
+            now - lastFrame[1] <= self.__window):
+            return True
+
+        ## The node which sent no frame for the longest time is forgotten
+        self.__lastFrames[source] = (frame, now)
+        self.__lastFrames.move_to_end(source)
+
+        if (len(self.__lastFrames) > self.__size):
+            self.__lastFrames.popitem(last=False)
+
+        return False
+
+class AsbStalenessTracker(object):
+    """Tracking of silent nodes with a heap keyed by their deadline."""
+
+    def __init__(self, staleTimeout, unavailableTimeout,
+        retryDelay=ASB_STALE_RETRY_DELAY):
+        self.__staleTimeout = staleTimeout
+        self.__unavailableTimeout = unavailableTimeout
+        self.__retryDelay = retryDelay
+        self.__deadlines = []
+        self.__lastSeen = {}
+        self.__retryDelays = {}
+        self.__unavailableNodeIds = set()
+
+    def register(self, nodeId, now):
+        if (nodeId not in self.__lastSeen):
+            self.__lastSeen[nodeId] = now
+            heapq.heappush(self.__deadlines,
+                (now + self.__staleTimeout, nodeId)
+            )
+
+    def unregister(self, nodeId):
+        ## The deadline is dropped from the heap when it is due
+        self.__lastSeen.pop(nodeId, None)
+        self.__retryDelays.pop(nodeId, None)
+        self.__unavailableNodeIds.discard(nodeId)
+
+    def seen(self, nodeId, now):
+        """Record a packet of the node and return True if it was unavailable."""
+
+        if (nodeId not in self.__lastSeen):
+            return False
+
+        ## The deadline in the heap is not updated but checked when it is due
+        self.__lastSeen[nodeId] = now
+        self.__retryDelays.pop(nodeId, None)
+
+        if (nodeId in self.__unavailableNodeIds):
+            self.__unavailableNodeIds.remove(nodeId)
+            return True
+
+        return False
+
+    def poll(self, now):
+        """Return the node to be requested and the nodes now unavailable."""
+
+        requestNodeId = None
+        unavailableNodeIds = []
+
+        while (self.__deadlines and self.__deadlines[0][0] <= now):
+            deadline, nodeId = self.__deadlines[0]
+
+            if (nodeId not in self.__lastSeen):
+                heapq.heappop(self.__deadlines)
+                continue
+
+            silentTime = now - self.__lastSeen[nodeId]
+
+            if (silentTime < self.__staleTimeout):
+                heapq.heapreplace(self.__deadlines,
+                    (self.__lastSeen[nodeId] + self.__staleTimeout, nodeId)
+                )
+                continue
+
+            if (silentTime >= self.__unavailableTimeout and
+                nodeId not in self.__unavailableNodeIds):
+                self.__unavailableNodeIds.add(nodeId)
+                unavailableNodeIds.append(nodeId)
+
+            ## Only one node is requested per poll to spread the load
+            if (requestNodeId is not None):
+                break
+
+            requestNodeId = nodeId
+
+            retryDelay = self.__retryDelays.get(nodeId,
+                min(self.__retryDelay, self.__staleTimeout)
+            )
+            self.__retryDelays[nodeId] = min(retryDelay * 2,
+                self.__unavailableTimeout
+            )
+
+            nextDeadline = now + retryDelay
+
+            ## The node must be checked again when it becomes unavailable
+            if (nodeId not in self.__unavailableNodeIds):
+                nextDeadline = min(nextDeadline,
+                    self.__lastSeen[nodeId] + self.__unavailableTimeout
+                )
+
+            heapq.heapreplace(self.__deadlines, (nextDeadline, nodeId))
+
+        return (requestNodeId, unavailableNodeIds)
+
+class AsbFloodNode(object):
+    """Packet count and quarantine of a node for the flood protection."""
+
+    def __init__(self, now):
+        self.windowStart = now
+        self.packetCount = 0
+        self.quarantineEnd = None
+        self.sampleCounter = 0
+
+class AsbFloodProtection(object):
+    """Quarantine of nodes which send more packets than allowed."""
+
+    def __init__(self, rate, quarantineTime, sample=0):
+        self.__rate = rate
+        self.__quarantineTime = quarantineTime
+        self.__sample = sample
+        self.__nodes = {}
+
+        self.__droppedPackets = 0
+
+    def isAllowed(self, nodeId, now):
+        """Count the packet of the node and return if it may be processed."""
+
+        node = self.__nodes.get(nodeId)
+
+        if (node is None):
+            node = self.__nodes[nodeId] = AsbFloodNode(now)
+
+        if (now - node.windowStart >= ASB_FLOOD_WINDOW):
+            node.windowStart = now
+            node.packetCount = 0
+
+        node.packetCount += 1
+
+        if (node.quarantineEnd is not None and now >= node.quarantineEnd):
+            _LOGGER.info("isAllowed(): The quarantine of node 0x%04X " + \
+                "is over.",
+                nodeId
+            )
+            node.quarantineEnd = None
+
+        if (node.quarantineEnd is None and
+            node.packetCount > self.__rate * ASB_FLOOD_WINDOW):
+            _LOGGER.warning("isAllowed(): The node 0x%04X sent more than " + \
+                "%s packets per second and is throttled for %s seconds!",
+                nodeId,
+                self.__rate,
+                self.__quarantineTime
+            )
+            node.quarantineEnd = now + self.__quarantineTime
+            node.sampleCounter = 0
+
+        if (node.quarantineEnd is None):
+            return True
+
+        ## Only every n-th packet of a throttled node is processed
+        node.sampleCounter += 1
+
+        if (self.__sample > 0 and node.sampleCounter % self.__sample == 0):
+            return True
+
+        self.__droppedPackets += 1
+        return False
+
+    def getMetrics(self, now):
+        return {
+            'flood_dropped_frames': self.__droppedPackets,
+            'throttled_nodes': [
+                "0x{:04X}".format(nodeId)
+                for nodeId, node in self.__nodes.items()
+                if node.quarantineEnd is not None and now < node.quarantineEnd
+            ],
+        }
+
+class AsbProfiler(object):
+    """Measurement of the time spent in the stages of the bridge."""
+
+    def __init__(self, useCProfile=True):
+        self.__profile = cProfile.Profile() if useCProfile else None
+        self.__isActive = False
+        self.__stageTimes = dict.fromkeys(ASB_PROFILE_STAGES, 0.0)
+        self.__stageCounts = dict.fromkeys(ASB_PROFILE_STAGES, 0)
+
+    def start(self):
+        self.__isActive = True
+
+    def stop(self):
+        self.__isActive = False
+        self.pause()
+
+    def now(self):
+        return time.perf_counter()
+
+    def add(self, stage, startTime):
+        """Add the time since the start time to the stage and return now."""
+
+        now = time.perf_counter()
+        self.__stageTimes[stage] += now - startTime
+        self.__stageCounts[stage] += 1
+
+        return now
+
+    def resume(self):
+        ## The profile is only enabled within the code of the bridge
+        if (self.__isActive and self.__profile is not None):
+            self.__profile.enable()
+
+    def pause(self):
+        if (self.__profile is not None):
+            self.__profile.disable()
+
+    def getSummary(self):
+        return {
+            stage: {
+                'count': self.__stageCounts[stage],
+                'total_ms': self.__stageTimes[stage] * 1e3,
+                'mean_us': (
+                    self.__stageTimes[stage] * 1e6 / self.__stageCounts[stage]
+                ) if self.__stageCounts[stage] > 0 else 0.0,
+            } for stage in ASB_PROFILE_STAGES
+        }
+
+    def writeStats(self, filename):
+        if (self.__profile is not None):
+            self.__profile.dump_stats(filename)
+
+def decodeAsbSubscription(line):
+    """Return the node ids of a subscribe line, or None for all nodes."""
+
+    nodeIds = {
+        int(nodeId, 16) for nodeId in line.split()[1:]
+    }
+
+    if (any(nodeId < 0x0000 or nodeId > 0xFFFF for nodeId in nodeIds)):
+        raise ValueError("The node id is out of range!")
+
+    return nodeIds if nodeIds else None
+
+class AsbMultiplexerClient(object):
+    """Client of the multiplexer server with a bounded frame buffer."""
+
+    def __init__(self, streamWriter):
+        self.streamWriter = streamWriter
+        self.frames = asyncio.Queue(maxsize=ASB_MULTIPLEXER_CLIENT_BUFFER_SIZE)
+        self.nodeIds = None
+        self.droppedFrames = 0
+
+class AsbMultiplexerServer(object):
+    """Local TCP or UNIX socket server sharing the bus with other processes.
+
+    Every client receives the received packets in the text framing, one
+    packet per line, and may send packets in the text framing to be written
+    to the bus. The line "subscribe <node id> ..." with hexadecimal node ids
+    limits the packets to the given source or target nodes.
+    """
+
+    def __init__(self, host, port=None, socketPath=None):
+        self.__host = host
+        self.__port = port
+        self.__socketPath = socketPath
+        self.__servers = []
+        self.__clients = {}
+        self.__writePacket = None
+        self.__droppedFrames = 0
+
+    @asyncio.coroutine
+    def start(self, writePacket):
+        self.__writePacket = writePacket
+
+        try:
+            if (self.__port is not None):
+                self.__servers.append((yield from asyncio.start_server(
+                    self.__handleClient, self.__host, self.__port
+                )))
+
+            if (self.__socketPath is not None):
+                ## The socket file of a previous run would block the address
+                if (os.path.exists(self.__socketPath) and
+                    stat.S_ISSOCK(os.stat(self.__socketPath).st_mode)):
+                    os.remove(self.__socketPath)
+
+                self.__servers.append((yield from asyncio.start_unix_server(
+                    self.__handleClient, self.__socketPath
+                )))
+        except OSError as e:
+            _LOGGER.error("start(): The multiplexer server could not be " + \
+                "started: %s",
+                e
+            )
+            return
+
+        _LOGGER.info("start(): The multiplexer server is listening.")
+
+    def stop(self):
+        for server in self.__servers:
+            server.close()
+
+        for clientTask in self.__clients.values():
+            if (clientTask is not None):
+                clientTask.cancel()
+
+        self.__servers = []
+
+    def getMetrics(self):
+        return {
+            'multiplexer_clients': len(self.__clients),
+            'multiplexer_dropped_frames': self.__droppedFrames + sum(
+                client.droppedFrames for client in self.__clients
+            ),
+        }
+
+    def addClient(self, streamWriter, clientTask=None):
+        client = AsbMultiplexerClient(streamWriter)
+        self.__clients[client] = clientTask
+
+        return client
+
+    def removeClient(self, client):
+        self.__droppedFrames += client.droppedFrames
+        del self.__clients[client]
+
+    def publish(self, asbPacket):
+        """Offer the packet to all clients without waiting for them."""
+
+        encodedAsbPacket = None
+
+        for client in self.__clients:
+            if (client.nodeIds is not None and
+                asbPacket.meta.source not in client.nodeIds and
+                asbPacket.meta.target not in client.nodeIds):
+                continue
+
+            ## The packet is only encoded if any client is interested
+            if (encodedAsbPacket is None):
+                encodedAsbPacket = encodeAsbPacket(asbPacket) + b"\n"
+
+            ## A slow client loses frames instead of stalling the bridge
+            try:
+                client.frames.put_nowait(encodedAsbPacket)
+            except asyncio.QueueFull:
+                client.droppedFrames += 1
+
+    @asyncio.coroutine
+    def __handleClient(self, streamReader, streamWriter):
+        client = self.addClient(streamWriter, asyncio.Task.current_task())
+
+        clientWriteTask = asyncio.ensure_future(self.__writeClient(client))
+
+        _LOGGER.info("__handleClient(): A multiplexer client is connected.")
+
+        try:
+            while True:
+                line = yield from streamReader.readline()
+
+                if (not line):
+                    break
+
+                self.__handleClientLine(client, line.strip())
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            clientWriteTask.cancel()
+            streamWriter.close()
+
+            self.removeClient(client)
+
+            _LOGGER.info("__handleClient(): A multiplexer client is " + \
+                "disconnected."
+            )
+
+    def __handleClientLine(self, client, line):
+        if (line.startswith(ASB_MULTIPLEXER_COMMAND_SUBSCRIBE)):
+            try:
+                client.nodeIds = decodeAsbSubscription(
+                    line.decode('UTF-8', 'replace')
+                )
+            except ValueError:
+                _LOGGER.warning("__handleClientLine(): The subscription " + \
+                    "'%s' of a multiplexer client is invalid!",
+                    line
+                )
+
+            return
+
+        asbPacket = decodeAsbPacket(line.decode('UTF-8', 'replace'))
+
+        if (asbPacket is not None):
+            self.__writePacket(asbPacket)
+        else:
+            _LOGGER.warning("__handleClientLine(): The packet sent by a " + \
+                "multiplexer client is invalid!"
+            )
+
+    @asyncio.coroutine
+    def __writeClient(self, client):
+        try:
+            while True:
+                encodedAsbPacket = yield from client.frames.get()
+                client.streamWriter.write(encodedAsbPacket)
+
+                yield from client.streamWriter.drain()
+        except ConnectionError as e:
+            _LOGGER.info("__writeClient(): A multiplexer client could not " + \
+                "be written: %s",
+                e
+            )
+
+            ## The read task of the client removes it when it is cancelled
+            client.streamWriter.close()
+            clientTask = self.__clients.get(client)
+
+            if (clientTask is not None):
+                clientTask.cancel()
+
 def constrain(value, minValue, maxValue):
     return min(maxValue, max(minValue, value))
 
 class AsysbusSerialBridge(object):
     """Representation of a Asysbus serial brigde."""
 
-    def __init__(self, hass, serialPort, baudrate):
+    def __init__(self, hass, serialPort, baudrate,
+        framing=DEFAULT_FRAMING, busBitrate=DEFAULT_BUS_BITRATE,
+        buttons=None, duplicateWindow=DEFAULT_DUPLICATE_WINDOW,
+        staleTimeout=DEFAULT_STALE_TIMEOUT,
+        unavailableTimeout=DEFAULT_UNAVAILABLE_TIMEOUT,
+        multiplexerServer=None, floodProtection=None):
         self.__hass = hass
         self.__serialPort = serialPort
         self.__baudrate = baudrate
+        self.__framing = framing
+        self.__busBitrate = busBitrate
         self.__serialLoopTask = None
+        self.__serialWriteTask = None
+        self.__staleCheckTask = None
+        self.__multiplexerServer = multiplexerServer
+        self.__floodProtection = floodProtection
+        self.__profiler = None
         self.__serialWriter = None
-        self.__devices = []
+        self.__writeQueue = asyncio.Queue(maxsize=ASB_WRITE_QUEUE_SIZE)
+        self.__droppedWriteFrames = 0
+        self.__writeTokenBucket = AsbTokenBucket(1.0, ASB_WRITE_BURST_AIRTIME,
+            hass.loop.time()
+        )
+        self.__airtimeMeter = AsbAirtimeMeter(ASB_LINK_UTILIZATION_WINDOW)
+        self.__buttonHandler = AsbButtonHandler(buttons,
+            self.__fireButtonEvent, hass.loop.call_later
+        ) if buttons else None
+        self.__duplicateFilter = \
+            AsbDuplicateFilter(duplicateWindow) if duplicateWindow > 0 else None
+        self.__receivedFrames = 0
+        self.__filteredDuplicateFrames = 0
+        self.__filteredEchoFrames = 0
+        self.__stalenessTracker = AsbStalenessTracker(staleTimeout,
+            max(staleTimeout, unavailableTimeout)
+        ) if staleTimeout > 0 else None
+
+        ## The registered devices by their node id and port
+        self.__nodes = {}
+
+        ## The last data of each node by node id, port and command
+        self.__nodeStates = {}
+
+        ## The devices by their id which state update is deferred until the
+        ## batch is done, because the entities are not hashable
+        self.__deferredStateUpdates = None
 
     def startConnection(self):
         _LOGGER.info("startConnection(): Starting serial connection to " + \
@@ -246,6 +1442,11 @@ class AsysbusSerialBridge(object):
             self.__readPacket(self.__serialPort, self.__baudrate)
         )
 
+        if (self.__multiplexerServer is not None):
+            self.__hass.loop.create_task(
+                self.__multiplexerServer.start(self.writePacket)
+            )
+
     def closeConnection(self):
         _LOGGER.info("closeConnection(): Closing serial connection to " + \
             "Asysbus serial bridge..."
@@ -254,29 +1455,352 @@ class AsysbusSerialBridge(object):
         if self.__serialLoopTask:
             self.__serialLoopTask.cancel()
 
-    def registerDevice(self, device):
-        """Register a device on the bridge."""
-        self.__devices.append(device)
+        if self.__serialWriteTask:
+            self.__serialWriteTask.cancel()
+
+        if self.__staleCheckTask:
+            self.__staleCheckTask.cancel()
+
+        if self.__multiplexerServer:
+            self.__multiplexerServer.stop()
 
-    def unregisterDevice(self, device):
+    def registerDevice(self, device, nodeId, port=ASB_PORT_ALL):
+        """Register a device for the given port of a node on the bridge."""
+        nodePorts = self.__nodes.setdefault(nodeId, {})
+        nodePorts.setdefault(port, []).append(device)
+
+        if (self.__stalenessTracker is not None):
+            self.__stalenessTracker.register(nodeId, self.__hass.loop.time())
+
+    def unregisterDevice(self, device, nodeId, port=ASB_PORT_ALL):
         """Unregister a device from the bridge."""
-        self.__devices.remove(device)
+        nodePorts = self.__nodes[nodeId]
+        nodePorts[port].remove(device)
+
+        if (not nodePorts[port]):
+            del nodePorts[port]
+
+        if (not nodePorts):
+            del self.__nodes[nodeId]
+
+            if (self.__stalenessTracker is not None):
+                self.__stalenessTracker.unregister(nodeId)
+
+    def requestNodeStates(self):
+        """Request the current state of all ports of every node once."""
+
+        for nodeId in self.__nodes:
+            self.requestNodeState(nodeId)
+
+    def requestNodeState(self, nodeId):
+        """Request the current state of all ports of the node."""
+
+        _LOGGER.info("requestNodeState(): Request current state " + \
+            "of node 0x%04X to be synced with devices.",
+            nodeId
+        )
+
+        asbPacketData = [ASB_CMD_REQ]
+        self.writePacket(AsbPacket(
+            meta = AsbMeta(
+                type = ASB_PKGTYPE_MULTICAST,
+                port = ASB_PORT_ALL,
+                source = ASB_BRIDGE_NODE_ID,
+                target = nodeId
+            ),
+            length = len(asbPacketData),
+            data = asbPacketData
+        ))
+
+    def __setNodeAvailable(self, nodeId, available):
+        for devices in self.__nodes.get(nodeId, {}).values():
+            for device in devices:
+                device.setAvailable(available)
+
+    @asyncio.coroutine
+    def __checkStaleNodes(self):
+        """Request the state of silent nodes again and mark them unavailable."""
+
+        while True:
+            yield from asyncio.sleep(ASB_STALE_CHECK_INTERVAL)
+
+            requestNodeId, unavailableNodeIds = \
+                self.__stalenessTracker.poll(self.__hass.loop.time())
+
+            for nodeId in unavailableNodeIds:
+                _LOGGER.warning("__checkStaleNodes(): The node 0x%04X " + \
+                    "is silent for too long and marked as unavailable!",
+                    nodeId
+                )
+
+                self.__setNodeAvailable(nodeId, False)
+
+            if (requestNodeId is not None):
+                self.requestNodeState(requestNodeId)
+
+    def getDevicesOfPacket(self, asbPacket):
+        """Return the devices of the source node addressed by the packet."""
+
+        nodePorts = self.__nodes.get(asbPacket.meta.source)
+
+        if (nodePorts is None):
+            return []
+
+        ## The port 0 addresses all ports like on the wire
+        port = asbPacket.meta.port if asbPacket.meta.port > 0 else ASB_PORT_ALL
+
+        ## The packets of all ports concern the devices of every port
+        if (port == ASB_PORT_ALL):
+            return [
+                device
+                for devices in nodePorts.values()
+                for device in devices
+            ]
+
+        ## The devices without port receive the packets of all ports
+        return nodePorts.get(port, []) + nodePorts.get(ASB_PORT_ALL, [])
+
+    def getMetrics(self):
+        """Return the current metrics of the bridge."""
+        metrics = {
+            'link_utilization': self.__airtimeMeter.getUtilization(
+                self.__hass.loop.time()
+            ),
+            'write_queue_size': self.__writeQueue.qsize(),
+            'write_dropped_frames': self.__droppedWriteFrames,
+            'received_frames': self.__receivedFrames,
+            'filtered_duplicate_frames': self.__filteredDuplicateFrames,
+            'filtered_echo_frames': self.__filteredEchoFrames,
+        }
+
+        if (self.__multiplexerServer is not None):
+            metrics.update(self.__multiplexerServer.getMetrics())
+
+        if (self.__floodProtection is not None):
+            metrics.update(self.__floodProtection.getMetrics(
+                self.__hass.loop.time()
+            ))
+
+        return metrics
 
     def writePacket(self, asbPacket):
-        ## StreamWriter.write() doesn't block, so no "yield from" needed
+        self.writePackets([asbPacket])
+
+    def startProfiling(self, profiler):
+        """Start the profiling unless the bridge is already profiled."""
+
+        if (self.__profiler is not None):
+            return False
+
+        profiler.start()
+        self.__profiler = profiler
+
+        return True
+
+    def stopProfiling(self):
+        if (self.__profiler is not None):
+            self.__profiler.stop()
+            self.__profiler = None
+
+    def writePackets(self, asbPackets):
+        """Queue the packets for writing and return if they were queued."""
+
+        ## The packets are only queued, the pacing is done by the write task
         if (self.__serialWriter is not None):
-            encodedAsbPacket = encodeAsbPacket(asbPacket)
-            self.__serialWriter.write(encodedAsbPacket)
+            profiler = self.__profiler
 
-            _LOGGER.info("writePacket(): Wrote the packet: %s " + \
-                "(binary representation = %s)",
-                asbPacket,
-                encodedAsbPacket
-            )
+            if (profiler is not None):
+                stageTime = profiler.now()
+
+            encodedAsbPackets = [
+                (asbPacket, encodeAsbFrame(asbPacket, self.__framing))
+                for asbPacket in asbPackets
+            ]
+
+            if (profiler is not None):
+                profiler.add(ASB_PROFILE_STAGE_ENCODE, stageTime)
+
+            ## A stalled serial link must not let the queue grow unbounded
+            try:
+                self.__writeQueue.put_nowait(encodedAsbPackets)
+            except asyncio.QueueFull:
+                self.__droppedWriteFrames += len(encodedAsbPackets)
+
+                _LOGGER.warning("writePackets(): The write queue is full, " + \
+                    "%s packets are dropped (%s dropped in total)!",
+                    len(encodedAsbPackets),
+                    self.__droppedWriteFrames
+                )
+                return False
+
+            return True
         else:
-            _LOGGER.warn("writePacket(): You tried to sent data but the " + \
+            _LOGGER.warn("writePackets(): You tried to sent data but the " + \
                 "serial connection is still not established!"
             )
+            return False
+
+    @asyncio.coroutine
+    def __writeQueuedPackets(self):
+        """Write the queued packets paced by their airtime."""
+
+        while True:
+            encodedAsbPackets = yield from self.__writeQueue.get()
+            pendingBytes = b""
+
+            ## A failed write must not stop the task, or the queue is stuck
+            try:
+                for asbPacket, encodedAsbPacket in encodedAsbPackets:
+                    airtime = calculateAsbAirtime(
+                        len(encodedAsbPacket),
+                        asbPacket.length,
+                        self.__baudrate,
+                        self.__busBitrate
+                    )
+
+                    delay = self.__writeTokenBucket.consume(airtime,
+                        self.__hass.loop.time()
+                    )
+
+                    ## The packets of a batch are written at once until paced
+                    if (delay > 0):
+                        self.__writeBytes(pendingBytes)
+                        pendingBytes = b""
+
+                        yield from asyncio.sleep(delay)
+
+                    pendingBytes += encodedAsbPacket
+                    self.__airtimeMeter.add(airtime, self.__hass.loop.time())
+
+                    _LOGGER.info("__writeQueuedPackets(): Wrote the " + \
+                        "packet: %s (binary representation = %s)",
+                        asbPacket,
+                        encodedAsbPacket
+                    )
+
+                self.__writeBytes(pendingBytes)
+            except Exception as e:
+                _LOGGER.exception("__writeQueuedPackets(): An exception " + \
+                    "is occurred while writing to the serial connection!"
+                )
+
+    def __writeBytes(self, data):
+        if (not data):
+            return
+
+        profiler = self.__profiler
+
+        ## StreamWriter.write() doesn't block, so no "yield from" needed
+        if (profiler is None):
+            self.__serialWriter.write(data)
+        else:
+            stageTime = profiler.now()
+            profiler.resume()
+
+            self.__serialWriter.write(data)
+
+            profiler.pause()
+            profiler.add(ASB_PROFILE_STAGE_WRITE, stageTime)
+
+    @asyncio.coroutine
+    def setNodeStates(self, nodeStates):
+        """Send the data to many nodes and update their devices at once."""
+
+        asbPackets = []
+
+        for nodeId, port, data in nodeStates:
+            asbPackets.append(AsbPacket(
+                meta = AsbMeta(
+                    type = ASB_PKGTYPE_MULTICAST,
+                    port = port,
+                    source = ASB_BRIDGE_NODE_ID,
+                    target = nodeId
+                ),
+                length = len(data),
+                data = data
+            ))
+
+        ## The devices must not show states which were never sent
+        if (not self.writePackets(asbPackets)):
+            return
+
+        ## The devices take the sent state like a state received from the node
+        self.__deferredStateUpdates = {}
+
+        for asbPacket in asbPackets:
+            nodeAsbPacket = AsbPacket(
+                meta = AsbMeta(
+                    type = asbPacket.meta.type,
+                    port = asbPacket.meta.port,
+                    source = asbPacket.meta.target,
+                    target = ASB_BRIDGE_NODE_ID
+                ),
+                length = asbPacket.length,
+                data = asbPacket.data
+            )
+
+            self.__cacheNodeState(nodeAsbPacket)
+
+            try:
+                for device in self.getDevicesOfPacket(nodeAsbPacket):
+                    device.onPacketReceived(nodeAsbPacket)
+            except Exception as e:
+                _LOGGER.exception("setNodeStates(): An exception is " + \
+                    "occurred while notifying observing devices!"
+                )
+
+        deferredStateUpdates = self.__deferredStateUpdates
+        self.__deferredStateUpdates = None
+
+        for device in deferredStateUpdates.values():
+            yield from device.async_update_ha_state()
+
+    def deferStateUpdate(self, device):
+        """Defer the state update of the device if a batch is applied."""
+
+        if (self.__deferredStateUpdates is None):
+            return False
+
+        self.__deferredStateUpdates[id(device)] = device
+        return True
+
+    def getNodeStates(self, nodeIds=None):
+        """Return the cached data of the given nodes as list of tuples."""
+
+        if (nodeIds is not None):
+            nodeIds = set(nodeIds)
+
+        return [
+            (nodeId, port, data)
+            for (nodeId, port, command), data in self.__nodeStates.items()
+            if nodeIds is None or nodeId in nodeIds
+        ]
+
+    def __cacheNodeState(self, asbPacket):
+        if (asbPacket.length < 1):
+            return
+
+        ports = [asbPacket.meta.port]
+
+        ## The packets of all ports are the state of every registered port
+        if (asbPacket.meta.port in [0x00, ASB_PORT_ALL]):
+            ports = set(self.__nodes.get(asbPacket.meta.source, {})) | {
+                asbPacket.meta.port
+            }
+
+        for port in ports:
+            self.__nodeStates[(
+                asbPacket.meta.source,
+                port,
+                asbPacket.data[0]
+            )] = list(asbPacket.data)
+
+    def __fireButtonEvent(self, buttonKey, clickType):
+        self.__hass.bus.async_fire(EVENT_ASYSBUS_BUTTON, {
+            ATTR_NODE_ID: buttonKey[0],
+            ATTR_COMMAND: buttonKey[1],
+            ATTR_CLICK_TYPE: clickType,
+        })
 
     @asyncio.coroutine
     def __readPacket(self, serialPort, baudrate, **kwargs):
@@ -288,12 +1812,25 @@ class AsysbusSerialBridge(object):
             **kwargs
         )
 
+        self.__serialWriteTask = self.__hass.loop.create_task(
+            self.__writeQueuedPackets()
+        )
+
         serialInitializedIsSet = False
 
         while True:
-            readLine = yield from serialReader.readline()
-            asbPacketString = readLine.decode('UTF-8').strip()
-            decodedAsbPacket = decodeAsbPacket(asbPacketString)
+            ## The hooks only cost a comparison while the bridge is not profiled
+            profiler = self.__profiler
+
+            if (profiler is not None):
+                profiler.pause()
+                stageTime = profiler.now()
+
+            asbFrame = yield from readAsbFrame(serialReader, self.__framing)
+
+            if (profiler is not None):
+                stageTime = profiler.add(ASB_PROFILE_STAGE_IDLE, stageTime)
+                profiler.resume()
 
             ## If the serial connection is ready, notify event once
             if (serialInitializedIsSet == False):
@@ -304,51 +1841,117 @@ class AsysbusSerialBridge(object):
                 )
                 serialInitializedIsSet = True
 
+                self.requestNodeStates()
+
+                if (self.__stalenessTracker is not None):
+                    self.__staleCheckTask = self.__hass.loop.create_task(
+                        self.__checkStaleNodes()
+                    )
+
+            self.__receivedFrames += 1
+
+            decodedAsbPacket = decodeAsbFrame(asbFrame, self.__framing)
+
+            if (profiler is not None):
+                stageTime = profiler.add(ASB_PROFILE_STAGE_DECODE, stageTime)
+
+            ## Some gateways echo the packets written by the bridge itself
+            if (decodedAsbPacket is not None and
+                decodedAsbPacket.meta.source == ASB_BRIDGE_NODE_ID):
+                self.__filteredEchoFrames += 1
+                continue
+
+            ## Retransmitted frames repeat the last frame of their source
+            if (decodedAsbPacket is not None and
+                self.__duplicateFilter is not None and
+                self.__duplicateFilter.isDuplicate(
+                    decodedAsbPacket.meta.source, asbFrame,
+                    self.__hass.loop.time())):
+                self.__filteredDuplicateFrames += 1
+                continue
+
+            ## The packets of flooding nodes are dropped before anything else
+            if (decodedAsbPacket is not None and
+                self.__floodProtection is not None and
+                not self.__floodProtection.isAllowed(
+                    decodedAsbPacket.meta.source,
+                    self.__hass.loop.time())):
+                continue
+
+            if (decodedAsbPacket is not None and
+                self.__stalenessTracker is not None and
+                self.__stalenessTracker.seen(decodedAsbPacket.meta.source,
+                    self.__hass.loop.time())):
+                _LOGGER.info("__readPacket(): The node 0x%04X is " + \
+                    "available again.",
+                    decodedAsbPacket.meta.source
+                )
+
+                self.__setNodeAvailable(decodedAsbPacket.meta.source, True)
+
             if (decodedAsbPacket is not None):
+                ## The button events are fired before anything else is done
+                if (self.__buttonHandler is not None):
+                    self.__buttonHandler.handlePacket(decodedAsbPacket,
+                        self.__hass.loop.time()
+                    )
+
                 _LOGGER.info("__readPacket(): Received a packet: %s",
                     decodedAsbPacket
                 )
 
+                self.__cacheNodeState(decodedAsbPacket)
+
+                if (profiler is not None):
+                    stageTime = profiler.add(ASB_PROFILE_STAGE_DISPATCH,
+                        stageTime
+                    )
+
                 try:
-                    for device in self.__devices:
+                    for device in self.getDevicesOfPacket(decodedAsbPacket):
                         device.onPacketReceived(decodedAsbPacket)
                 except Exception as e:
                     _LOGGER.exception("__readPacket(): An exception is " + \
                         "occurred while notifying observing devices!"
                     )
 
+                if (profiler is not None):
+                    stageTime = profiler.add(ASB_PROFILE_STAGE_ENTITY_CALLBACK,
+                        stageTime
+                    )
+
+                if (self.__multiplexerServer is not None):
+                    self.__multiplexerServer.publish(decodedAsbPacket)
+
+                    if (profiler is not None):
+                        profiler.add(ASB_PROFILE_STAGE_PUBLISH, stageTime)
+
 class AsysbusNode():
     """Parent class for all Asysbus devices."""
 
-    def __init__(self, hass, nodeId, name):
+    def __init__(self, hass, nodeId, port, name):
         self._nodeId = nodeId
+        self._port = port
         self._name = name
+        self._available = True
 
-        ASBSERIALBRIDGE.registerDevice(self)
+        ## The current state is requested once per node by the bridge
+        ASBSERIALBRIDGE.registerDevice(self, nodeId, port)
 
-        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_ASYSBUS_SERIAL_READY,
-            lambda event: self._sendRequestCurrentState()
-        )
+    def setAvailable(self, available):
+        self._available = available
+        self.async_schedule_update_ha_state()
 
-    def _sendRequestCurrentState(self):
-        global ASBSERIALBRIDGE
+    def async_schedule_update_ha_state(self, force_refresh=False):
+        """Schedule the state update unless the bridge defers it."""
 
-        _LOGGER.info("_sendRequestCurrentState((): Request current state " + \
-            "of device '%s' to be synced with device.",
-            self._name
-        )
+        if (not ASBSERIALBRIDGE.deferStateUpdate(self)):
+            super().async_schedule_update_ha_state(force_refresh)
 
-        asbPacketData = [ASB_CMD_REQ]
-        ASBSERIALBRIDGE.writePacket(AsbPacket(
-            meta = AsbMeta(
-                type = ASB_PKGTYPE_MULTICAST,
-                port = 0xFF,
-                source = ASB_BRIDGE_NODE_ID,
-                target = self._nodeId
-            ),
-            length = len(asbPacketData),
-            data = asbPacketData
-        ))
+    @property
+    def available(self):
+        """Return True if the node was not silent for too long."""
+        return self._available
 
     def onPacketReceived(self, packet):
         raise NotImplementedError()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of the Asysbus wire framings against a local loopback gateway.
+
+Run it with "python3 asysbus_benchmark.py" from the component directory.
+"""
+
+import asyncio
+import asysbus
+import time
+
+from asysbus import (
+    ASB_BRIDGE_NODE_ID,
+    ASB_CMD_1B,
+    ASB_CMD_S_LIGHT,
+    ASB_FRAMING_TEXT,
+    ASB_FRAMINGS,
+    ASB_PKGTYPE_MULTICAST,
+    DEFAULT_BAUDRATE,
+    EVENT_ASYSBUS_BUTTON,
+    AsbMeta,
+    AsbPacket,
+    AsysbusSerialBridge,
+    decodeAsbFrame,
+    encodeAsbFrame,
+    readAsbFrame
+)
+
+from homeassistant.core import HomeAssistant, callback
+
+BENCHMARK_FRAME_COUNT = 20000
+BENCHMARK_BUTTON_PRESS_COUNT = 2000
+
+BENCHMARK_BUTTON_NODE_ID = 0x0FA0
+
+## One start bit, eight data bits and one stop bit per byte (8N1)
+UART_BITS_PER_BYTE = 10
+
+class AsysbusLoopbackGateway(object):
+    """Stand-in for the serial gateway which echoes every written frame."""
+
+    def __init__(self, loop, framing):
+        self.__framing = framing
+        self.reader = asyncio.StreamReader(loop = loop)
+        self.writtenBytes = 0
+
+    def write(self, data):
+        ## The text framing gateway terminates every frame with a line break
+        if (self.__framing == ASB_FRAMING_TEXT):
+            data = data + b"\n"
+
+        self.writtenBytes += len(data)
+        self.reader.feed_data(data)
+
+    @asyncio.coroutine
+    def openSerialConnection(self, **kwargs):
+        """Replacement of the serial connection used by the bridge."""
+        return (self.reader, self)
+
+@asyncio.coroutine
+def benchmarkFraming(loop, framing, frameCount):
+    gateway = AsysbusLoopbackGateway(loop, framing)
+
+    asbPacketData = [ASB_CMD_S_LIGHT, 0x01, 0xFF, 0x01, 0xAA, 0xBB, 0xCC, 0xDD]
+    asbPacket = AsbPacket(
+        meta = AsbMeta(
+            type = ASB_PKGTYPE_MULTICAST,
+            port = 0xFF,
+            source = ASB_BRIDGE_NODE_ID,
+            target = 0x03E8
+        ),
+        length = len(asbPacketData),
+        data = asbPacketData
+    )
+
+    startTime = time.perf_counter()
+
+    for i in range(frameCount):
+        gateway.write(encodeAsbFrame(asbPacket, framing))
+        asbFrame = yield from readAsbFrame(gateway.reader, framing)
+        decodedAsbPacket = decodeAsbFrame(asbFrame, framing)
+
+        assert decodedAsbPacket == asbPacket
+
+    elapsedTime = time.perf_counter() - startTime
+    bytesPerFrame = gateway.writtenBytes / frameCount
+
+    return (bytesPerFrame, frameCount / elapsedTime)
+
+@asyncio.coroutine
+def benchmarkButtonEventLatency(loop, framing, pressCount):
+    hass = HomeAssistant(loop)
+    gateway = AsysbusLoopbackGateway(loop, framing)
+
+    ## The bridge reads from the loopback gateway instead of the serial port
+    asysbus.open_serial_connection = gateway.openSerialConnection
+
+    asysbusSerialBridge = AsysbusSerialBridge(hass, None, DEFAULT_BAUDRATE,
+        framing, buttons = {(BENCHMARK_BUTTON_NODE_ID, ASB_CMD_1B): 60.0},
+        duplicateWindow = 0
+    )
+    asysbusSerialBridge.startConnection()
+
+    latencies = []
+    eventReceived = asyncio.Event(loop = loop)
+
+    ## Automation triggers are callbacks on the event bus as well
+    @callback
+    def onButtonEvent(event):
+        ## Only the first event of each frame is the relevant latency
+        if (not eventReceived.is_set()):
+            latencies.append(time.perf_counter() - frameWrittenTime)
+            eventReceived.set()
+
+    hass.bus.async_listen(EVENT_ASYSBUS_BUTTON, onButtonEvent)
+
+    for i in range(pressCount):
+        for buttonState in [0x1, 0x0]:
+            asbPacketData = [ASB_CMD_1B, buttonState]
+            encodedAsbPacket = encodeAsbFrame(AsbPacket(
+                meta = AsbMeta(
+                    type = ASB_PKGTYPE_MULTICAST,
+                    port = 0xFF,
+                    source = BENCHMARK_BUTTON_NODE_ID,
+                    target = 0x0000
+                ),
+                length = len(asbPacketData),
+                data = asbPacketData
+            ), framing)
+
+            eventReceived.clear()
+            frameWrittenTime = time.perf_counter()
+            gateway.write(encodedAsbPacket)
+
+            yield from eventReceived.wait()
+
+    asysbusSerialBridge.closeConnection()
+
+    latencies.sort()
+
+    return (
+        latencies[len(latencies) // 2],
+        latencies[int(len(latencies) * 0.99)]
+    )
+
+def main():
+    loop = asyncio.get_event_loop()
+
+    print("{:<8} {:>14} {:>18} {:>22}".format(
+        "framing",
+        "bytes/frame",
+        "codec frames/s",
+        "wire frames/s @{}".format(DEFAULT_BAUDRATE)
+    ))
+
+    for framing in ASB_FRAMINGS:
+        bytesPerFrame, framesPerSecond = loop.run_until_complete(
+            benchmarkFraming(loop, framing, BENCHMARK_FRAME_COUNT)
+        )
+
+        wireFramesPerSecond = DEFAULT_BAUDRATE / \
+            (UART_BITS_PER_BYTE * bytesPerFrame)
+
+        print("{:<8} {:>14.1f} {:>18.0f} {:>22.0f}".format(
+            framing,
+            bytesPerFrame,
+            framesPerSecond,
+            wireFramesPerSecond
+        ))
+
+    print()
+    print("{:<8} {:>22} {:>22}".format(
+        "framing",
+        "button event p50 (us)",
+        "button event p99 (us)"
+    ))
+
+    for framing in ASB_FRAMINGS:
+        medianLatency, p99Latency = loop.run_until_complete(
+            benchmarkButtonEventLatency(loop, framing,
+                BENCHMARK_BUTTON_PRESS_COUNT
+            )
+        )
+
+        print("{:<8} {:>22.1f} {:>22.1f}".format(
+            framing,
+            medianLatency * 1e6,
+            p99Latency * 1e6
+        ))
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,101 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import asyncio
+import os
+import tempfile
 import unittest
+import unittest.mock
+import voluptuous as vol
 from asysbus import AsbMeta, AsbPacket, encodeAsbPacket, decodeAsbPacket
+from asysbus import encodeAsbPacketBinary, decodeAsbPacketBinary
+from asysbus import readAsbFrame
+from asysbus import calculateAsbAirtime, AsbTokenBucket, AsbAirtimeMeter
+from asysbus import AsbValueAggregator, AsbDuplicateFilter, AsbButtonHandler
+from asysbus import AsbStalenessTracker, AsbFloodProtection, AsbProfiler
+from asysbus import validateProfileFilename
+from asysbus import AsbMultiplexerServer, decodeAsbSubscription
+from asysbus import ASB_MULTIPLEXER_CLIENT_BUFFER_SIZE
+from asysbus import AsysbusSerialBridge
+
+class FakeTimer(object):
+    """Timer of the event loop which is run by the test itself."""
+
+    def __init__(self, callback, *args):
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        self.callback(*self.args)
+
+class FakeHass(object):
+    """Home Assistant instance which only provides the event loop."""
+
+    def __init__(self, loop):
+        self.loop = loop
+
+class FakeDevice(object):
+    """Device which records the packets and state updates it receives."""
+
+    def __init__(self, bridge):
+        self.bridge = bridge
+        self.packets = []
+        self.scheduledStateUpdates = 0
+        self.stateUpdates = 0
+
+    def onPacketReceived(self, packet):
+        self.packets.append(packet)
+
+        if (not self.bridge.deferStateUpdate(self)):
+            self.scheduledStateUpdates += 1
+
+    @asyncio.coroutine
+    def async_update_ha_state(self):
+        self.stateUpdates += 1
+
+def createNodePacket(source, port, data):
+    return AsbPacket(
+        meta = AsbMeta(type = 0x01, port = port, source = source, target = 0x0001),
+        length = len(data),
+        data = data
+    )
+
+def createButtonPacket(data):
+    return AsbPacket(
+        meta = AsbMeta(type = 0x01, port = 0xFF, source = 0x0FA0, target = 0x0000),
+        length = len(data),
+        data = data
+    )
 
 class TestPlatformAsysbus(unittest.TestCase):
     """Test the Asysbus platform."""
 
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def createBridgeWithDevices(self):
+        bridge = AsysbusSerialBridge(FakeHass(self.loop), None, 115200,
+            staleTimeout = 0
+        )
+
+        devices = {
+            port: FakeDevice(bridge) for port in [0x01, 0x02, 0xFF]
+        }
+
+        for port, device in devices.items():
+            bridge.registerDevice(device, 0x000A, port)
+
+        return (bridge, devices)
+
     def test_encode_valid_multicast_packet(self):
         expectedAsbPacket = b"1BAFF2511"
 
@@ -134,5 +223,524 @@ class TestPlatformAsysbus(unittest.TestCase):
         decodedPacket = decodeAsbPacket("2B1A1424aa1bb2")
         self.assertEqual(expectedAsbPacket, decodedPacket)
 
+    def test_encode_valid_multicast_packet_binary(self):
+        expectedAsbPacket = b"\x7E\x09\x01\x00\x0B\x00\x0A\xFF\x02\x51\x01\x31"
+
+        encodedPacket = encodeAsbPacketBinary(AsbPacket(
+            meta = AsbMeta(type = 0x01, port = 0xFF, source = 0x000A, target = 0x000B),
+            length = 2,
+            data = [0x51, 0x01]
+        ))
+
+        self.assertEqual(expectedAsbPacket, encodedPacket)
+
+    def test_encode_valid_multicast_packet_binary_with_zero_port_which_becomes_ff(self):
+        encodedPacket = encodeAsbPacketBinary(AsbPacket(
+            meta = AsbMeta(type = 0x01, port = 0x00, source = 0x1234, target = 0x5678),
+            length = 2,
+            data = [0xAA, 0xBB]
+        ))
+
+        self.assertEqual(0xFF, encodedPacket[7])
+
+    def test_decode_invalid_packet_binary(self):
+        self.assertIsNone(decodeAsbPacketBinary(b"invalidpacketbytes"))
+
+    def test_decode_packet_binary_with_invalid_checksum(self):
+        self.assertIsNone(decodeAsbPacketBinary(
+            b"\x7E\x09\x01\x00\x0B\x00\x0A\xFF\x02\x51\x01\x00"
+        ))
+
+    def test_decode_packet_binary_with_invalid_frame_length(self):
+        self.assertIsNone(decodeAsbPacketBinary(
+            b"\x7E\x0A\x01\x00\x0B\x00\x0A\xFF\x02\x51\x01\x31"
+        ))
+
+    def test_decode_valid_unicast_packet_binary_with_eight_byte_data(self):
+        expectedAsbPacket = AsbPacket(
+            meta = AsbMeta(type = 0x02, port = 0x42, source = 0x1234, target = 0x5678),
+            length = 8,
+            data = [0xAA, 0x01, 0xBB, 0x02, 0xCC, 0x03, 0xDD, 0x04]
+        )
+
+        decodedPacket = decodeAsbPacketBinary(encodeAsbPacketBinary(expectedAsbPacket))
+        self.assertEqual(expectedAsbPacket, decodedPacket)
+
+    def test_read_frame_binary_resynchronizes_after_garbage(self):
+        asbPacket = AsbPacket(
+            meta = AsbMeta(type = 0x01, port = 0x01, source = 0x1234, target = 0x5678),
+            length = 2,
+            data = [0xAA, 0xBB]
+        )
+        encodedPacket = encodeAsbPacketBinary(asbPacket)
+
+        streamReader = asyncio.StreamReader(loop = self.loop)
+
+        ## The start bytes within the garbage announce too long frame bodies
+        streamReader.feed_data(b"\x00\x7E\xFF\x7E\x7E\x10" + encodedPacket)
+        streamReader.feed_eof()
+
+        frame = self.loop.run_until_complete(readAsbFrame(streamReader, 'binary'))
+
+        self.assertEqual(encodedPacket, frame)
+        self.assertEqual(asbPacket, decodeAsbPacketBinary(frame))
+
+    def test_bridge_routes_packet_of_port_to_devices_of_port_and_all_ports(self):
+        bridge, devices = self.createBridgeWithDevices()
+
+        self.assertEqual([devices[0x01], devices[0xFF]],
+            bridge.getDevicesOfPacket(createNodePacket(0x000A, 0x01, [0x51, 0x01]))
+        )
+
+    def test_bridge_routes_packet_of_all_ports_to_devices_of_every_port(self):
+        bridge, devices = self.createBridgeWithDevices()
+
+        for port in [0xFF, 0x00]:
+            self.assertEqual(
+                [devices[0x01], devices[0x02], devices[0xFF]],
+                bridge.getDevicesOfPacket(createNodePacket(0x000A, port, [0x51, 0x01]))
+            )
+
+    def test_bridge_routes_packet_of_unknown_node_to_no_device(self):
+        bridge, devices = self.createBridgeWithDevices()
+
+        self.assertEqual([],
+            bridge.getDevicesOfPacket(createNodePacket(0x000B, 0x01, [0x51, 0x01]))
+        )
+
+    def test_bridge_sets_node_states_in_one_batch(self):
+        bridge, devices = self.createBridgeWithDevices()
+
+        with unittest.mock.patch.object(bridge, 'writePackets',
+            return_value = True) as writePackets:
+            self.loop.run_until_complete(bridge.setNodeStates([
+                (0x000A, 0x01, [0x51, 0x01]),
+                (0x000B, 0xFF, [0x51, 0x00]),
+            ]))
+
+        writePackets.assert_called_once()
+
+        asbPackets = writePackets.call_args[0][0]
+        self.assertEqual([0x000A, 0x000B],
+            [asbPacket.meta.target for asbPacket in asbPackets]
+        )
+
+    def test_bridge_updates_state_of_devices_once_per_batch(self):
+        bridge, devices = self.createBridgeWithDevices()
+
+        with unittest.mock.patch.object(bridge, 'writePackets',
+            return_value = True):
+            self.loop.run_until_complete(bridge.setNodeStates([
+                (0x000A, 0x01, [0x51, 0x01]),
+                (0x000A, 0xFF, [0xDB, 0x01]),
+            ]))
+
+        self.assertEqual(2, len(devices[0x01].packets))
+        self.assertEqual(1, len(devices[0x02].packets))
+        self.assertEqual(2, len(devices[0xFF].packets))
+
+        for device in devices.values():
+            self.assertEqual(0, device.scheduledStateUpdates)
+            self.assertEqual(1, device.stateUpdates)
+
+        ## Packets received later are not deferred anymore
+        self.assertFalse(bridge.deferStateUpdate(devices[0x01]))
+
+    def test_bridge_does_not_update_devices_if_states_are_not_sent(self):
+        bridge, devices = self.createBridgeWithDevices()
+
+        ## The serial connection is not established
+        self.loop.run_until_complete(bridge.setNodeStates([
+            (0x000A, 0x01, [0x51, 0x01]),
+        ]))
+
+        for device in devices.values():
+            self.assertEqual([], device.packets)
+            self.assertEqual(0, device.stateUpdates)
+
+        self.assertEqual([], bridge.getNodeStates())
+
+    def test_bridge_returns_cached_states_of_given_nodes(self):
+        bridge, devices = self.createBridgeWithDevices()
+
+        with unittest.mock.patch.object(bridge, 'writePackets',
+            return_value = True):
+            self.loop.run_until_complete(bridge.setNodeStates([
+                (0x000A, 0xFF, [0x51, 0x01]),
+                (0x000B, 0x01, [0x51, 0x00]),
+            ]))
+
+        self.assertEqual([(0x000B, 0x01, [0x51, 0x00])],
+            bridge.getNodeStates([0x000B])
+        )
+        self.assertEqual([
+            (0x000A, 0x01, [0x51, 0x01]),
+            (0x000A, 0x02, [0x51, 0x01]),
+            (0x000A, 0xFF, [0x51, 0x01]),
+        ], sorted(bridge.getNodeStates([0x000A])))
+
+    def test_airtime_is_limited_by_serial_link(self):
+        airtime = calculateAsbAirtime(38, 8, 115200, 125000)
+        self.assertAlmostEqual(380 / 115200, airtime)
+
+    def test_airtime_is_limited_by_bus(self):
+        airtime = calculateAsbAirtime(18, 8, 115200, 50000)
+        self.assertAlmostEqual(160 / 50000, airtime)
+
+    def test_token_bucket_allows_burst_without_delay(self):
+        tokenBucket = AsbTokenBucket(1.0, 0.01, 0.0)
+
+        self.assertEqual(0.0, tokenBucket.consume(0.004, 0.0))
+        self.assertEqual(0.0, tokenBucket.consume(0.004, 0.0))
+
+    def test_token_bucket_delays_when_capacity_is_exceeded(self):
+        tokenBucket = AsbTokenBucket(1.0, 0.01, 0.0)
+
+        tokenBucket.consume(0.01, 0.0)
+        self.assertAlmostEqual(0.004, tokenBucket.consume(0.004, 0.0))
+        self.assertAlmostEqual(0.006, tokenBucket.consume(0.004, 0.002))
+
+    def test_token_bucket_refills_up_to_capacity(self):
+        tokenBucket = AsbTokenBucket(1.0, 0.01, 0.0)
+
+        tokenBucket.consume(0.01, 0.0)
+        self.assertEqual(0.0, tokenBucket.consume(0.01, 100.0))
+        self.assertAlmostEqual(0.005, tokenBucket.consume(0.005, 100.0))
+
+    def test_airtime_meter_measures_utilization_in_window(self):
+        airtimeMeter = AsbAirtimeMeter(10.0)
+
+        airtimeMeter.add(1.0, 0.0)
+        airtimeMeter.add(2.0, 5.0)
+
+        self.assertAlmostEqual(0.3, airtimeMeter.getUtilization(5.0))
+        self.assertAlmostEqual(0.2, airtimeMeter.getUtilization(12.0))
+        self.assertEqual(0.0, airtimeMeter.getUtilization(20.0))
+
+    def test_value_aggregator_writes_first_value_immediately(self):
+        valueAggregator = AsbValueAggregator('mean', 10.0)
+
+        self.assertEqual(20.0, valueAggregator.add(20.0, 0.0))
+        self.assertIsNone(valueAggregator.getFlushTime())
+
+    def test_value_aggregator_aggregates_values_over_window(self):
+        valueAggregator = AsbValueAggregator('mean', 10.0)
+
+        self.assertEqual(20.0, valueAggregator.add(20.0, 0.0))
+        self.assertIsNone(valueAggregator.add(21.0, 5.0))
+        self.assertIsNone(valueAggregator.add(23.0, 8.0))
+        self.assertEqual(10.0, valueAggregator.getFlushTime())
+        self.assertIsNone(valueAggregator.flush(9.0))
+        self.assertEqual(22.0, valueAggregator.flush(10.0))
+        self.assertIsNone(valueAggregator.getFlushTime())
+
+    def test_value_aggregator_does_not_mix_values_of_closed_window(self):
+        valueAggregator = AsbValueAggregator('mean', 10.0)
+
+        self.assertEqual(20.0, valueAggregator.add(20.0, 0.0))
+        self.assertIsNone(valueAggregator.add(21.0, 5.0))
+        self.assertEqual(21.0, valueAggregator.add(25.0, 12.0))
+        self.assertEqual(22.0, valueAggregator.getFlushTime())
+        self.assertEqual(25.0, valueAggregator.flush(22.0))
+
+    def test_value_aggregator_writes_every_value_of_node_slower_than_window(self):
+        valueAggregator = AsbValueAggregator('mean', 10.0)
+
+        for i, value in enumerate([20.0, 21.0, 22.0]):
+            self.assertIsNone(valueAggregator.flush(i * 60.0 - 50.0))
+            self.assertEqual(value, valueAggregator.add(value, i * 60.0))
+
+    def test_value_aggregator_aggregates_min_and_max(self):
+        minAggregator = AsbValueAggregator('min', 1.0)
+        maxAggregator = AsbValueAggregator('max', 1.0)
+
+        for value, now in [(3.0, 0.0), (1.0, 0.5), (2.0, 0.8)]:
+            minAggregator.add(value, now)
+            maxAggregator.add(value, now)
+
+        self.assertEqual(1.0, minAggregator.flush(1.0))
+        self.assertEqual(2.0, maxAggregator.flush(1.0))
+
+    def test_value_aggregator_suppresses_changes_within_deadband(self):
+        valueAggregator = AsbValueAggregator('last', 0.0, deadband = 0.5)
+
+        self.assertEqual(20.0, valueAggregator.add(20.0, 0.0))
+        self.assertIsNone(valueAggregator.add(20.5, 1.0))
+        self.assertEqual(20.6, valueAggregator.add(20.6, 2.0))
+
+    def test_value_aggregator_limits_update_rate(self):
+        valueAggregator = AsbValueAggregator('last', 0.0, maxUpdateRate = 0.5)
+
+        self.assertEqual(20.0, valueAggregator.add(20.0, 0.0))
+        self.assertIsNone(valueAggregator.add(21.0, 1.0))
+        self.assertEqual(22.0, valueAggregator.add(22.0, 2.0))
+
+    def createButtonHandler(self):
+        events = []
+        timers = []
+
+        def callLater(delay, callback, *args):
+            timers.append(FakeTimer(callback, *args))
+            return timers[-1]
+
+        buttonHandler = AsbButtonHandler({(0x0FA0, 0x51): 0.5},
+            lambda buttonKey, clickType: events.append(clickType),
+            callLater
+        )
+
+        return (buttonHandler, events, timers)
+
+    def test_button_handler_fires_short_press(self):
+        buttonHandler, events, timers = self.createButtonHandler()
+
+        buttonHandler.handlePacket(createButtonPacket([0x51, 0x01]), 0.0)
+        buttonHandler.handlePacket(createButtonPacket([0x51, 0x01]), 0.1)
+        buttonHandler.handlePacket(createButtonPacket([0x51, 0x00]), 0.2)
+
+        self.assertEqual(['press', 'short_press', 'release'], events)
+        self.assertEqual(1, len(timers))
+        self.assertTrue(timers[0].cancelled)
+
+    def test_button_handler_fires_long_press(self):
+        buttonHandler, events, timers = self.createButtonHandler()
+
+        buttonHandler.handlePacket(createButtonPacket([0x51, 0x01]), 0.0)
+        timers[0].run()
+        buttonHandler.handlePacket(createButtonPacket([0x51, 0x01]), 0.8)
+        buttonHandler.handlePacket(createButtonPacket([0x51, 0x00]), 1.0)
+
+        self.assertEqual(['press', 'long_press', 'release'], events)
+
+    def test_button_handler_releases_press_of_lost_release_packet(self):
+        buttonHandler, events, timers = self.createButtonHandler()
+
+        buttonHandler.handlePacket(createButtonPacket([0x51, 0x01]), 0.0)
+        timers[0].run()
+        buttonHandler.handlePacket(createButtonPacket([0x51, 0x01]), 5.0)
+        buttonHandler.handlePacket(createButtonPacket([0x51, 0x00]), 5.2)
+
+        self.assertEqual([
+            'press', 'long_press', 'release',
+            'press', 'short_press', 'release'
+        ], events)
+
+    def test_button_handler_ignores_unknown_buttons(self):
+        buttonHandler, events, timers = self.createButtonHandler()
+
+        buttonHandler.handlePacket(createButtonPacket([0x52, 0x01]), 0.0)
+
+        self.assertEqual([], events)
+        self.assertEqual([], timers)
+
+    def test_duplicate_filter_detects_identical_frames_within_window(self):
+        duplicateFilter = AsbDuplicateFilter(0.1)
+
+        self.assertFalse(duplicateFilter.isDuplicate(0x0A, b"frame", 0.0))
+        self.assertTrue(duplicateFilter.isDuplicate(0x0A, b"frame", 0.05))
+        self.assertFalse(duplicateFilter.isDuplicate(0x0B, b"frame", 0.05))
+        self.assertFalse(duplicateFilter.isDuplicate(0x0A, b"frame", 0.2))
+
+    def test_duplicate_filter_does_not_extend_window_by_duplicates(self):
+        duplicateFilter = AsbDuplicateFilter(0.1)
+
+        self.assertFalse(duplicateFilter.isDuplicate(0x0A, b"frame", 0.0))
+        self.assertTrue(duplicateFilter.isDuplicate(0x0A, b"frame", 0.08))
+        self.assertFalse(duplicateFilter.isDuplicate(0x0A, b"frame", 0.15))
+
+    def test_duplicate_filter_keeps_frames_repeated_after_other_frames(self):
+        duplicateFilter = AsbDuplicateFilter(0.1)
+
+        self.assertFalse(duplicateFilter.isDuplicate(0x0A, b"on", 0.0))
+        self.assertFalse(duplicateFilter.isDuplicate(0x0A, b"off", 0.03))
+        self.assertFalse(duplicateFilter.isDuplicate(0x0A, b"on", 0.06))
+
+    def test_duplicate_filter_is_not_interrupted_by_other_nodes(self):
+        duplicateFilter = AsbDuplicateFilter(0.1)
+
+        self.assertFalse(duplicateFilter.isDuplicate(0x0A, b"on", 0.0))
+        self.assertFalse(duplicateFilter.isDuplicate(0x0B, b"off", 0.03))
+        self.assertTrue(duplicateFilter.isDuplicate(0x0A, b"on", 0.06))
+
+    def test_duplicate_filter_forgets_least_recent_nodes(self):
+        duplicateFilter = AsbDuplicateFilter(1.0, size = 2)
+
+        self.assertFalse(duplicateFilter.isDuplicate(0x01, b"frame", 0.0))
+        self.assertFalse(duplicateFilter.isDuplicate(0x02, b"frame", 0.0))
+        self.assertFalse(duplicateFilter.isDuplicate(0x03, b"frame", 0.0))
+        self.assertFalse(duplicateFilter.isDuplicate(0x01, b"frame", 0.0))
+        self.assertTrue(duplicateFilter.isDuplicate(0x03, b"frame", 0.0))
+
+    def test_staleness_tracker_does_not_request_recently_seen_nodes(self):
+        stalenessTracker = AsbStalenessTracker(100.0, 300.0)
+        stalenessTracker.register(0x07D0, 0.0)
+
+        stalenessTracker.seen(0x07D0, 50.0)
+
+        self.assertEqual((None, []), stalenessTracker.poll(120.0))
+        self.assertEqual((0x07D0, []), stalenessTracker.poll(150.0))
+
+    def test_staleness_tracker_requests_one_node_per_poll(self):
+        stalenessTracker = AsbStalenessTracker(100.0, 300.0)
+        stalenessTracker.register(0x07D0, 0.0)
+        stalenessTracker.register(0x07D1, 0.0)
+
+        firstRequestNodeId, _ = stalenessTracker.poll(100.0)
+        secondRequestNodeId, _ = stalenessTracker.poll(101.0)
+
+        self.assertEqual({0x07D0, 0x07D1},
+            {firstRequestNodeId, secondRequestNodeId}
+        )
+        self.assertEqual((None, []), stalenessTracker.poll(102.0))
+
+    def test_staleness_tracker_doubles_retry_delay_of_silent_nodes(self):
+        stalenessTracker = AsbStalenessTracker(100.0, 1000.0, retryDelay = 10.0)
+        stalenessTracker.register(0x07D0, 0.0)
+
+        self.assertEqual((0x07D0, []), stalenessTracker.poll(100.0))
+        self.assertEqual((None, []), stalenessTracker.poll(109.0))
+        self.assertEqual((0x07D0, []), stalenessTracker.poll(110.0))
+        self.assertEqual((None, []), stalenessTracker.poll(129.0))
+        self.assertEqual((0x07D0, []), stalenessTracker.poll(130.0))
+
+    def test_staleness_tracker_marks_silent_nodes_unavailable(self):
+        stalenessTracker = AsbStalenessTracker(100.0, 300.0)
+        stalenessTracker.register(0x07D0, 0.0)
+
+        self.assertEqual((0x07D0, [0x07D0]), stalenessTracker.poll(300.0))
+        self.assertEqual((None, []), stalenessTracker.poll(301.0))
+        self.assertTrue(stalenessTracker.seen(0x07D0, 302.0))
+        self.assertFalse(stalenessTracker.seen(0x07D0, 303.0))
+
+    def test_staleness_tracker_forgets_unregistered_nodes(self):
+        stalenessTracker = AsbStalenessTracker(100.0, 300.0)
+        stalenessTracker.register(0x07D0, 0.0)
+        stalenessTracker.unregister(0x07D0)
+
+        self.assertEqual((None, []), stalenessTracker.poll(500.0))
+        self.assertFalse(stalenessTracker.seen(0x07D0, 501.0))
+
+    def test_flood_protection_allows_packets_within_rate(self):
+        floodProtection = AsbFloodProtection(5, 10.0)
+
+        for i in range(10):
+            self.assertTrue(floodProtection.isAllowed(0x07D0, i * 0.2))
+
+    def test_flood_protection_drops_packets_of_flooding_node(self):
+        floodProtection = AsbFloodProtection(5, 10.0)
+
+        allowedPackets = [
+            floodProtection.isAllowed(0x07D0, 0.0) for i in range(10)
+        ]
+
+        self.assertEqual([True] * 5 + [False] * 5, allowedPackets)
+        self.assertTrue(floodProtection.isAllowed(0x07D1, 0.0))
+        self.assertFalse(floodProtection.isAllowed(0x07D0, 5.0))
+        self.assertTrue(floodProtection.isAllowed(0x07D0, 10.0))
+
+    def test_flood_protection_samples_packets_of_flooding_node(self):
+        floodProtection = AsbFloodProtection(5, 10.0, sample = 3)
+
+        allowedPackets = [
+            floodProtection.isAllowed(0x07D0, 0.0) for i in range(11)
+        ]
+
+        self.assertEqual([True] * 5 + [False, False, True] * 2, allowedPackets)
+        self.assertEqual(['0x07D0'],
+            floodProtection.getMetrics(1.0)['throttled_nodes']
+        )
+
+    def test_profiler_sums_stage_times(self):
+        profiler = AsbProfiler(useCProfile = False)
+
+        profiler.add('decode', profiler.now() - 0.001)
+        profiler.add('decode', profiler.now() - 0.003)
+
+        profileSummary = profiler.getSummary()
+
+        self.assertEqual(2, profileSummary['decode']['count'])
+        self.assertAlmostEqual(4.0, profileSummary['decode']['total_ms'], 1)
+        self.assertAlmostEqual(2000.0, profileSummary['decode']['mean_us'], -1)
+        self.assertEqual(0, profileSummary['write']['count'])
+
+    def test_profiler_writes_stats_of_profiled_code(self):
+        profiler = AsbProfiler()
+        profiler.start()
+
+        profiler.resume()
+        sorted(range(100))
+        profiler.pause()
+
+        profiler.stop()
+
+        with tempfile.TemporaryDirectory() as temporaryDirectory:
+            profileFilename = os.path.join(temporaryDirectory, "stats.prof")
+            profiler.writeStats(profileFilename)
+
+            self.assertTrue(os.path.getsize(profileFilename) > 0)
+
+    def test_profile_filename_in_configuration_directory_is_valid(self):
+        self.assertEqual("asysbus.prof", validateProfileFilename("asysbus.prof"))
+
+    def test_profile_filename_with_directory_is_invalid(self):
+        for filename in ["/etc/passwd", "../asysbus.prof", "www/asysbus.prof", "..", ""]:
+            with self.assertRaises(vol.Invalid):
+                validateProfileFilename(filename)
+
+    def test_decode_valid_subscription(self):
+        self.assertEqual({0x000A, 0x1234},
+            decodeAsbSubscription("subscribe A 1234")
+        )
+
+    def test_decode_subscription_without_node_ids(self):
+        self.assertIsNone(decodeAsbSubscription("subscribe"))
+
+    def test_decode_invalid_subscription(self):
+        with self.assertRaises(ValueError):
+            decodeAsbSubscription("subscribe A XYZ")
+
+        with self.assertRaises(ValueError):
+            decodeAsbSubscription("subscribe 10000")
+
+    def test_multiplexer_publishes_packets_of_subscribed_nodes(self):
+        multiplexerServer = AsbMultiplexerServer('127.0.0.1')
+
+        client = multiplexerServer.addClient(None)
+        subscribedClient = multiplexerServer.addClient(None)
+        subscribedClient.nodeIds = {0x000A}
+
+        for source in [0x000A, 0x000B]:
+            multiplexerServer.publish(AsbPacket(
+                meta = AsbMeta(type = 0x01, port = 0xFF, source = source, target = 0x0001),
+                length = 2,
+                data = [0x51, 0x01]
+            ))
+
+        self.assertEqual(2, client.frames.qsize())
+        self.assertEqual(1, subscribedClient.frames.qsize())
+        self.assertEqual(b"\x011\x1f1\x1fA\x1fFF\x1f2\x0251\x1f1\x1f\x04\n",
+            subscribedClient.frames.get_nowait()
+        )
+
+    def test_multiplexer_drops_frames_of_full_client_buffer(self):
+        multiplexerServer = AsbMultiplexerServer('127.0.0.1')
+        client = multiplexerServer.addClient(None)
+
+        asbPacket = AsbPacket(
+            meta = AsbMeta(type = 0x01, port = 0xFF, source = 0x000A, target = 0x0001),
+            length = 2,
+            data = [0x51, 0x01]
+        )
+
+        for i in range(ASB_MULTIPLEXER_CLIENT_BUFFER_SIZE + 3):
+            multiplexerServer.publish(asbPacket)
+
+        self.assertEqual(ASB_MULTIPLEXER_CLIENT_BUFFER_SIZE, client.frames.qsize())
+        self.assertEqual(3, multiplexerServer.getMetrics()['multiplexer_dropped_frames'])
+
+        multiplexerServer.removeClient(client)
+
+        self.assertEqual(0, multiplexerServer.getMetrics()['multiplexer_clients'])
+        self.assertEqual(3, multiplexerServer.getMetrics()['multiplexer_dropped_frames'])
+
 if __name__ == '__main__':
     unittest.main()
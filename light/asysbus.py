@@ -19,6 +19,7 @@ from custom_components.asysbus import (
     ASB_BRIDGE_NODE_ID,
     ASB_CMD_S_LIGHT,
     ASB_PKGTYPE_MULTICAST,
+    ASB_PORT_ALL,
     AsbMeta,
     AsbPacket,
     AsysbusNode,
@@ -36,7 +37,7 @@ from homeassistant.components.light import (
     Light
 )
 
-from homeassistant.const import CONF_ID, CONF_TYPE, CONF_NAME
+from homeassistant.const import CONF_ID, CONF_TYPE, CONF_NAME, CONF_PORT
 
 from homeassistant.util.color import (
     color_rgb_to_rgbw,
@@ -72,6 +73,9 @@ PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend({
         cv.ensure_list,
         [vol.In(LIGHT_TYPES)]
     ),
+    vol.Optional(CONF_PORT, default=ASB_PORT_ALL): vol.All(vol.Coerce(int),
+        vol.Range(min=0x01, max=0xFF)
+    ),
     vol.Optional(CONF_NAME, default=DEFAULT_NAME): cv.string,
 })
 
@@ -92,18 +96,21 @@ def async_setup_platform(hass, config, async_add_devices, discovery_info=None):
         return False
 
     asysbusLightNodeId = config.get(CONF_ID)
+    asysbusLightPort = config.get(CONF_PORT)
     asysbusLightName = config.get(CONF_NAME)
     asysbusLightType = config.get(CONF_TYPE)[0]
 
     async_add_devices([
-        AsysbusLight(hass, asysbusLightNodeId, asysbusLightName, asysbusLightType)
+        AsysbusLight(hass, asysbusLightNodeId, asysbusLightPort,
+            asysbusLightName, asysbusLightType
+        )
     ])
 
 class AsysbusLight(AsysbusNode, Light):
     """Representation of an Asysbus light."""
 
-    def __init__(self, hass, nodeId, name, type):
-        AsysbusNode.__init__(self, hass, nodeId, name)
+    def __init__(self, hass, nodeId, port, name, type):
+        AsysbusNode.__init__(self, hass, nodeId, port, name)
         self.__type = type
         self.__state = False
         self.__brightness = 0
@@ -287,7 +294,7 @@ class AsysbusLight(AsysbusNode, Light):
         asysbus.ASBSERIALBRIDGE.writePacket(AsbPacket(
             meta = AsbMeta(
                 type = ASB_PKGTYPE_MULTICAST,
-                port = 0xFF,
+                port = self._port,
                 source = ASB_BRIDGE_NODE_ID,
                 target = self._nodeId
             ),
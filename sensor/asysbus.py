@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Asysbus sensor component.
+
+For more details about this component, please refer to the documentation at
+https://sicherheitskritisch.de/
+"""
+
+import asyncio
+import custom_components.asysbus as asysbus
+import enum
+import homeassistant.helpers.config_validation as cv
+import logging
+import voluptuous as vol
+
+from custom_components.asysbus import (
+    ASB_AGGREGATION_MEAN,
+    ASB_AGGREGATIONS,
+    ASB_CMD_S_HUM,
+    ASB_CMD_S_TEMP,
+    ASB_PORT_ALL,
+    CONF_COMMAND,
+    AsbValueAggregator,
+    AsysbusNode
+)
+
+from homeassistant.components.sensor import PLATFORM_SCHEMA
+from homeassistant.const import (
+    CONF_ID,
+    CONF_NAME,
+    CONF_PORT,
+    CONF_TYPE,
+    CONF_UNIT_OF_MEASUREMENT,
+    TEMP_CELSIUS
+)
+from homeassistant.helpers.entity import Entity
+
+DEPENDENCIES = ['asysbus']
+
+_LOGGER = logging.getLogger(__name__)
+
+@enum.unique
+class SensorType(enum.Enum):
+    TEMPERATURE = "temperature"
+    HUMIDITY = "humidity"
+    CUSTOM = "custom"
+
+    def __str__(self):
+        return self.value
+
+    def __eq__(self, other):
+        return self.value == other
+
+## The command, unit and scale of the reported value for each sensor type
+SENSOR_TYPES = {
+    str(SensorType.TEMPERATURE): (ASB_CMD_S_TEMP, TEMP_CELSIUS, 0.01),
+    str(SensorType.HUMIDITY): (ASB_CMD_S_HUM, "%", 0.01),
+    str(SensorType.CUSTOM): (None, None, 1.0),
+}
+
+CONF_SCALE = 'scale'
+CONF_AGGREGATION = 'aggregation'
+CONF_WINDOW = 'window'
+CONF_DEADBAND = 'deadband'
+CONF_MAX_UPDATE_RATE = 'max_update_rate'
+
+DEFAULT_NAME = "Asysbus sensor"
+DEFAULT_TYPE = str(SensorType.TEMPERATURE)
+DEFAULT_AGGREGATION = ASB_AGGREGATION_MEAN
+DEFAULT_WINDOW = 10.0
+DEFAULT_DEADBAND = 0.0
+
+def validateSensorCommand(config):
+    """Validate that the command is given for a custom sensor."""
+
+    if (config[CONF_TYPE] == SensorType.CUSTOM and
+        CONF_COMMAND not in config):
+        raise vol.Invalid("The option '{}' is required for sensors of " \
+            "type '{}'".format(CONF_COMMAND, SensorType.CUSTOM)
+        )
+
+    return config
+
+PLATFORM_SCHEMA = vol.All(PLATFORM_SCHEMA.extend({
+    vol.Required(CONF_ID): vol.All(vol.Coerce(int), vol.Range(
+        min=0x0000,
+        max=0xFFFF
+    )),
+    vol.Optional(CONF_PORT, default=ASB_PORT_ALL): vol.All(vol.Coerce(int),
+        vol.Range(min=0x01, max=0xFF)
+    ),
+    vol.Optional(CONF_NAME, default=DEFAULT_NAME): cv.string,
+    vol.Optional(CONF_TYPE, default=DEFAULT_TYPE): vol.In(list(SENSOR_TYPES)),
+    vol.Optional(CONF_COMMAND): vol.All(vol.Coerce(int), vol.Range(
+        min=0x00,
+        max=0xFF
+    )),
+    vol.Optional(CONF_SCALE): vol.Coerce(float),
+    vol.Optional(CONF_UNIT_OF_MEASUREMENT): cv.string,
+    vol.Optional(CONF_AGGREGATION, default=DEFAULT_AGGREGATION):
+        vol.In(list(ASB_AGGREGATIONS)),
+    vol.Optional(CONF_WINDOW, default=DEFAULT_WINDOW): vol.All(
+        vol.Coerce(float),
+        vol.Range(min=0)
+    ),
+    vol.Optional(CONF_DEADBAND, default=DEFAULT_DEADBAND): vol.All(
+        vol.Coerce(float),
+        vol.Range(min=0)
+    ),
+    vol.Optional(CONF_MAX_UPDATE_RATE): vol.All(
+        vol.Coerce(float),
+        vol.Range(min=0.001)
+    ),
+}), validateSensorCommand)
+
+@asyncio.coroutine
+def async_setup_platform(hass, config, async_add_devices, discovery_info=None):
+    """Set up the Asysbus sensor platform."""
+
+    if asysbus.ASBSERIALBRIDGE is None:
+        _LOGGER.error("async_setup_platform(): The Asysbus serial bridge " + \
+            "could not be connected!"
+        )
+        return False
+
+    asysbusSensorNodeId = config.get(CONF_ID)
+    asysbusSensorPort = config.get(CONF_PORT)
+    asysbusSensorName = config.get(CONF_NAME)
+
+    command, unitOfMeasurement, scale = SENSOR_TYPES[config.get(CONF_TYPE)]
+
+    asysbusSensorCommand = config.get(CONF_COMMAND, command)
+    asysbusSensorUnit = config.get(CONF_UNIT_OF_MEASUREMENT, unitOfMeasurement)
+    asysbusSensorScale = config.get(CONF_SCALE, scale)
+
+    asysbusSensorAggregator = AsbValueAggregator(
+        config.get(CONF_AGGREGATION),
+        config.get(CONF_WINDOW),
+        config.get(CONF_DEADBAND),
+        config.get(CONF_MAX_UPDATE_RATE)
+    )
+
+    async_add_devices([
+        AsysbusSensor(hass, asysbusSensorNodeId, asysbusSensorPort,
+            asysbusSensorName, asysbusSensorCommand, asysbusSensorUnit,
+            asysbusSensorScale, asysbusSensorAggregator
+        )
+    ])
+
+class AsysbusSensor(AsysbusNode, Entity):
+    """Representation of an Asysbus sensor."""
+
+    def __init__(self, hass, nodeId, port, name, command, unitOfMeasurement,
+        scale, aggregator):
+        AsysbusNode.__init__(self, hass, nodeId, port, name)
+        self.__hass = hass
+        self.__command = command
+        self.__unitOfMeasurement = unitOfMeasurement
+        self.__scale = scale
+        self.__aggregator = aggregator
+        self.__flushTimer = None
+        self.__state = None
+
+    def onPacketReceived(self, packet):
+        if (packet.meta.source == self._nodeId):
+            if (packet.length > 1 and packet.data[0] == self.__command):
+                ## The value is transferred as signed big endian integer
+                value = int.from_bytes(bytes(packet.data[1:]), 'big',
+                    signed=True) * self.__scale
+
+                aggregatedValue = self.__aggregator.add(value,
+                    self.__hass.loop.time()
+                )
+
+                _LOGGER.info("onPacketReceived(): The value of sensor " + \
+                    "'%s' was received from device: value = %s",
+                    self._name,
+                    value
+                )
+
+                self.__updateState(aggregatedValue)
+                self.__scheduleFlush()
+
+    def __updateState(self, aggregatedValue):
+        ## Only the downsampled values are written as state
+        if (aggregatedValue is not None):
+            self.__state = round(aggregatedValue, 2)
+            self.async_schedule_update_ha_state()
+
+    def __scheduleFlush(self):
+        """Flush the window when it is over, even if the node stays silent."""
+
+        flushTime = self.__aggregator.getFlushTime()
+
+        if (flushTime is not None and self.__flushTimer is None):
+            self.__flushTimer = self.__hass.loop.call_at(flushTime,
+                self.__flush
+            )
+
+    def __flush(self):
+        self.__flushTimer = None
+        self.__updateState(self.__aggregator.flush(self.__hass.loop.time()))
+
+        ## The timer may fire within the clock resolution before the window end
+        self.__scheduleFlush()
+
+    @property
+    def name(self):
+        """Return the name of the device."""
+        return self._name
+
+    @property
+    def should_poll(self):
+        """No polling needed."""
+        return False
+
+    @property
+    def state(self):
+        """Return the state of the sensor."""
+        return self.__state
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of measurement of the sensor."""
+        return self.__unitOfMeasurement
@@ -18,13 +18,19 @@ from custom_components.asysbus import (
     ASB_BRIDGE_NODE_ID,
     ASB_CMD_1B,
     ASB_PKGTYPE_MULTICAST,
+    ASB_PORT_ALL,
     AsbMeta,
     AsbPacket,
     AsysbusNode
 )
 
 from homeassistant.components.switch import PLATFORM_SCHEMA
-from homeassistant.const import CONF_ID, CONF_NAME, EVENT_HOMEASSISTANT_STOP
+from homeassistant.const import (
+    CONF_ID,
+    CONF_NAME,
+    CONF_PORT,
+    EVENT_HOMEASSISTANT_STOP
+)
 from homeassistant.helpers.entity import ToggleEntity
 
 DEPENDENCIES = ['asysbus']
@@ -38,6 +44,9 @@ PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend({
         min=0x0000,
         max=0xFFFF
     )),
+    vol.Optional(CONF_PORT, default=ASB_PORT_ALL): vol.All(vol.Coerce(int),
+        vol.Range(min=0x01, max=0xFF)
+    ),
     vol.Optional(CONF_NAME, default=DEFAULT_NAME): cv.string,
 })
 
@@ -52,17 +61,20 @@ def async_setup_platform(hass, config, async_add_devices, discovery_info=None):
         return False
 
     asysbusSwitchNodeId = config.get(CONF_ID)
+    asysbusSwitchPort = config.get(CONF_PORT)
     asysbusSwitchName = config.get(CONF_NAME)
 
     async_add_devices([
-        AsysbusSwitch(hass, asysbusSwitchNodeId, asysbusSwitchName)
+        AsysbusSwitch(hass, asysbusSwitchNodeId, asysbusSwitchPort,
+            asysbusSwitchName
+        )
     ])
 
 class AsysbusSwitch(AsysbusNode, ToggleEntity):
     """Representation of an Asysbus switch."""
 
-    def __init__(self, hass, nodeId, name):
-        AsysbusNode.__init__(self, hass, nodeId, name)
+    def __init__(self, hass, nodeId, port, name):
+        AsysbusNode.__init__(self, hass, nodeId, port, name)
         self.__state = False
 
     def onPacketReceived(self, packet):
@@ -109,7 +121,7 @@ class AsysbusSwitch(AsysbusNode, ToggleEntity):
         asysbus.ASBSERIALBRIDGE.writePacket(AsbPacket(
             meta = AsbMeta(
                 type = ASB_PKGTYPE_MULTICAST,
-                port = 0xFF,
+                port = self._port,
                 source = ASB_BRIDGE_NODE_ID,
                 target = self._nodeId
             ),